@@ -0,0 +1,78 @@
+"""
+Address verdict index
+SQLite in WAL mode, keyed by a 64-bit content hash of each address, with
+its last status code, check flags and check time, so a repeat upload only
+re-checks new addresses and those past a freshness window
+"""
+
+import hashlib
+import time
+
+from sqlite_store import SQLiteStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS address_verdicts (
+    hash       INTEGER PRIMARY KEY,
+    status     INTEGER NOT NULL,
+    flags      INTEGER NOT NULL,
+    checked_at REAL NOT NULL
+);
+"""
+
+
+def address_hash(email):
+    """Signed 64-bit key for an address, as SQLite stores integers"""
+    digest = hashlib.blake2b(email.encode('utf-8', 'surrogatepass'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True)
+
+
+class AddressIndex(SQLiteStore):
+    """Address hash -> (status code, flags) rows with the time they were checked"""
+
+    schema = SCHEMA
+
+    def get_many(self, hashes, max_age, batch_size=900):
+        """{hash: (status, flags)} for the hashes checked less than max_age seconds ago"""
+        since = time.time() - max_age
+        found = {}
+        hashes = list(hashes)
+        conn = self._conn()
+        for start in range(0, len(hashes), batch_size):
+            batch = hashes[start:start + batch_size]
+            placeholders = ','.join('?' * len(batch))
+            rows = conn.execute(
+                f"SELECT hash, status, flags FROM address_verdicts "
+                f"WHERE hash IN ({placeholders}) AND checked_at > ?",
+                batch + [since],
+            )
+            for key, status, flags in rows:
+                found[key] = (status, flags)
+        return found
+
+    def put_many(self, items):
+        """Store (hash, status, flags) tuples, checked now, in a single transaction"""
+        now = time.time()
+        rows = [(key, status, flags, now) for key, status, flags in items]
+        if not rows:
+            return
+
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN')
+            conn.executemany(
+                "INSERT INTO address_verdicts (hash, status, flags, checked_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(hash) DO UPDATE SET status = excluded.status, "
+                "flags = excluded.flags, checked_at = excluded.checked_at",
+                rows,
+            )
+
+    def compact(self, max_age):
+        """Drop entries older than max_age seconds and truncate the WAL; returns rows removed"""
+        conn = self._conn()
+        removed = conn.execute("DELETE FROM address_verdicts WHERE checked_at <= ?",
+                               (time.time() - max_age,)).rowcount
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        return removed
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM address_verdicts").fetchone()[0]
@@ -0,0 +1,468 @@
+"""
+Throughput benchmarks
+Seeded synthetic corpora plus a local stub DNS server, so stage numbers
+are reproducible and independent of live DNS.
+Run: python benchmark.py --rows 200000 --json bench.json
+     python benchmark.py --compare bench.json   (exit 1 on regressions)
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import multiprocessing
+import os
+import random
+import resource
+import string
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+
+from dns_resolver import CLASS_IN, TYPE_A, TYPE_MX, TYPE_SOA, encode_name, _read_name
+
+STAGES = ('extract', 'syntax', 'syntax_batch', 'dns', 'dns_batch', 'validate')
+TLDS = ('com', 'net', 'org', 'io', 'de', 'co.uk')
+
+
+# ---------------------------------------------------------------- corpora
+
+def _word(rng, low, high):
+    return ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(low, high)))
+
+
+def _malformed(rng, local, domain):
+    """One of the ways real exports get addresses wrong"""
+    kind = rng.randrange(6)
+    if kind == 0:
+        return f"{local}{domain}"             # missing @
+    if kind == 1:
+        return f"{local}..x@{domain}"         # consecutive dots
+    if kind == 2:
+        return f"{local}.@{domain}"           # local part ends with a dot
+    if kind == 3:
+        return f"{local}@{domain[:-3]}.c0m1"  # bad TLD
+    if kind == 4:
+        return f"{local} {local}@{domain}"    # embedded space
+    return f"@{domain}"                       # empty local part
+
+
+def generate_emails(rows, duplicate_rate=0.1, malformed_rate=0.05, domains=5000, zipf=1.1, seed=42):
+    """Seeded list of addresses; domain popularity follows a Zipf(zipf) distribution"""
+    rng = random.Random(seed)
+    pool = [f"{_word(rng, 4, 10)}{index}.{rng.choice(TLDS)}" for index in range(domains)]
+    weights = [1.0 / (rank + 1) ** zipf for rank in range(domains)]
+    cumulative = []
+    total = 0.0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+
+    emails = []
+    for _ in range(rows):
+        if emails and rng.random() < duplicate_rate:
+            email = rng.choice(emails)
+            emails.append(email.upper() if rng.random() < 0.3 else email)
+            continue
+        domain = rng.choices(pool, cum_weights=cumulative)[0]
+        local = f"{_word(rng, 3, 8)}.{_word(rng, 3, 10)}{rng.randrange(100)}"
+        if rng.random() < malformed_rate:
+            emails.append(_malformed(rng, local, domain))
+        else:
+            emails.append(f"{local}@{domain}")
+    return emails
+
+
+def write_csv(path, emails, seed=42):
+    """CSV with the address in a middle column, as typical CRM exports have it"""
+    rng = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'name', 'Email Address', 'signup_date'])
+        for index, email in enumerate(emails):
+            writer.writerow([index, _word(rng, 4, 12).title(), email, f"2024-{rng.randint(1, 12):02d}-01"])
+    return path
+
+
+def write_zip(path, emails, members=4, seed=42):
+    """ZIP holding the corpus split across several CSV members"""
+    with tempfile.TemporaryDirectory() as tmp, zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        size = -(-len(emails) // members)
+        for part in range(members):
+            member = write_csv(os.path.join(tmp, f"part{part}.csv"), emails[part * size:(part + 1) * size],
+                               seed=seed + part)
+            archive.write(member, os.path.basename(member))
+    return path
+
+
+# ---------------------------------------------------------------- stub DNS
+
+def _record(rtype, ttl, rdata):
+    # Owner name is a pointer to the question name at offset 12
+    return b'\xc0\x0c' + struct.pack('>HHIH', rtype, CLASS_IN, ttl, len(rdata)) + rdata
+
+
+class _StubProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        reply = self.server.answer(data)
+        if reply is None:
+            return
+        delay = self.server.delay()
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self.transport.sendto, reply, addr)
+        else:
+            self.transport.sendto(reply, addr)
+
+
+class StubDNSServer:
+    """Authoritative-for-everything UDP server with tunable latency and failures
+
+    Every name gets an MX pointing at mx.<name>, which has an A record.
+    A seeded nxdomain_rate share of domains does not exist; drop_rate and
+    servfail_rate apply per query.
+    """
+
+    def __init__(self, latency=0.002, jitter=0.001, drop_rate=0.0, servfail_rate=0.0,
+                 nxdomain_rate=0.05, ttl=300, seed=42):
+        self.latency = latency
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.servfail_rate = servfail_rate
+        self.nxdomain_rate = nxdomain_rate
+        self.ttl = ttl
+        self.seed = seed
+        self.queries = 0
+        self.dropped = 0
+        self.address = None
+        self._rng = random.Random(seed)
+        self._soa = (encode_name('ns.stub.test') + encode_name('hostmaster.stub.test')
+                     + struct.pack('>IIIII', 1, 3600, 600, 86400, ttl))
+        self._loop = None
+        self._transport = None
+
+    def exists(self, domain):
+        """Stable per-domain verdict, independent of query order"""
+        return random.Random(f"{self.seed}:{domain}").random() >= self.nxdomain_rate
+
+    def delay(self):
+        return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+    def answer(self, data):
+        self.queries += 1
+        try:
+            name, offset = _read_name(data, 12)
+            qtype = struct.unpack('>H', data[offset:offset + 2])[0]
+        except (IndexError, struct.error, UnicodeDecodeError):
+            return None
+
+        roll = self._rng.random()
+        if roll < self.drop_rate:
+            self.dropped += 1
+            return None
+
+        question = data[12:offset + 4]
+        domain = name[3:] if name.startswith('mx.') else name
+        answers = b''
+        if roll < self.drop_rate + self.servfail_rate:
+            rcode = 2
+        elif not self.exists(domain):
+            rcode = 3
+        else:
+            rcode = 0
+            if qtype == TYPE_MX and name == domain:
+                answers = _record(TYPE_MX, self.ttl, struct.pack('>H', 10) + encode_name('mx.' + domain))
+            elif qtype == TYPE_A:
+                answers = _record(TYPE_A, self.ttl, bytes((127, 0, 0, 1)))
+
+        authority = b'' if answers or rcode == 2 else _record(TYPE_SOA, self.ttl, self._soa)
+        header = data[:2] + struct.pack('>HHHHH', 0x8180 | rcode, 1, 1 if answers else 0,
+                                        1 if authority else 0, 0)
+        return header + question + answers + authority
+
+    def start(self):
+        """Serve on 127.0.0.1 from a background thread; returns 'host:port'"""
+        ready = threading.Event()
+
+        async def listen():
+            self._transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+                lambda: _StubProtocol(self), local_addr=('127.0.0.1', 0))
+            ready.set()
+
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name='stub-dns', daemon=True).start()
+        asyncio.run_coroutine_threadsafe(listen(), self._loop).result()
+        ready.wait()
+        host, port = self._transport.get_extra_info('sockname')[:2]
+        self.address = f"{host}:{port}"
+        return self.address
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._transport.close)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# ---------------------------------------------------------------- stages
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100.0 * len(ordered))) - 1))]
+
+
+def peak_rss_mb():
+    """Peak resident set size (MB) of this process and its reaped children"""
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and KiB elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def timed_calls(func, items):
+    """Run func over items; returns (wall seconds, per-call latencies)"""
+    latencies = []
+    clock = time.perf_counter
+    started = clock()
+    for item in items:
+        call_started = clock()
+        func(item)
+        latencies.append(clock() - call_started)
+    return clock() - started, latencies
+
+
+def stage_extract(corpus, settings):
+    from ingest import extract_emails_from_csv, process_zip
+    started = time.perf_counter()
+    if corpus.endswith('.zip'):
+        emails = process_zip(corpus)
+    else:
+        emails = extract_emails_from_csv(corpus)
+    elapsed = time.perf_counter() - started
+    return len(emails), elapsed, [elapsed]
+
+
+def stage_syntax(corpus, settings):
+    from email_syntax import validate_email_syntax
+    emails = settings['emails']
+    elapsed, latencies = timed_calls(validate_email_syntax, emails)
+    return len(emails), elapsed, latencies
+
+
+def stage_syntax_batch(corpus, settings):
+    from email_syntax import check_syntax_batch, BATCH_SIZE
+    emails = settings['emails']
+    batches = [emails[start:start + BATCH_SIZE] for start in range(0, len(emails), BATCH_SIZE)]
+    elapsed, latencies = timed_calls(check_syntax_batch, batches)
+    return len(emails), elapsed, latencies
+
+
+def _unique_domains(emails, limit=None):
+    from email_syntax import validate_email_syntax
+    domains = list(dict.fromkeys(email.rsplit('@', 1)[-1].lower()
+                                 for email in emails if validate_email_syntax(email)))
+    return domains[:limit] if limit else domains
+
+
+def stage_dns(corpus, settings):
+    import pipeline
+    domains = _unique_domains(settings['emails'], settings['dns_sample'])
+    elapsed, latencies = timed_calls(pipeline.check_domain_exists, domains)
+    return len(domains), elapsed, latencies
+
+
+def stage_dns_batch(corpus, settings):
+    import pipeline
+    domains = _unique_domains(settings['emails'])
+    started = time.perf_counter()
+    pipeline.check_domains(domains)
+    elapsed = time.perf_counter() - started
+    return len(domains), elapsed, [elapsed]
+
+
+def stage_validate(corpus, settings):
+    """Upload through the Flask route and wait for the background job"""
+    import main
+    client = main.app.test_client()
+    started = time.perf_counter()
+    with open(corpus, 'rb') as f:
+        response = client.post('/validate', data={'file': (f, os.path.basename(corpus))},
+                               content_type='multipart/form-data')
+    job_id = response.get_json()['job_id']
+    version = 0
+    while True:
+        snapshot = client.get(f'/jobs/{job_id}?since={version}').get_json()
+        if snapshot['status'] in ('done', 'failed'):
+            break
+        version = snapshot['version']
+    elapsed = time.perf_counter() - started
+    if snapshot['status'] == 'failed':
+        raise RuntimeError(snapshot['error'])
+    return snapshot['total'], elapsed, [elapsed]
+
+
+def _run_stage(name, corpus, settings, env, results):
+    """Child process body: isolated imports, caches and peak RSS per stage"""
+    os.environ.update(env)
+    os.chdir(settings['workdir'])
+    try:
+        if name in ('syntax', 'syntax_batch', 'dns', 'dns_batch'):
+            settings['emails'] = generate_emails(**settings['corpus'])
+        if name in ('dns', 'dns_batch', 'validate'):
+            import main  # noqa: F401 - import cost stays out of the timings
+        baseline = peak_rss_mb()
+        items, elapsed, latencies = globals()['stage_' + name](corpus, settings)
+        results.put({'stage': name, 'items': items, 'seconds': elapsed, 'latencies': latencies,
+                     'rss_baseline_mb': baseline, 'rss_peak_mb': peak_rss_mb()})
+    except Exception as e:
+        results.put({'stage': name, 'error': f"{type(e).__name__}: {e}"})
+
+
+def run_stage(name, corpus, settings, env, repeat=1):
+    """Run a stage `repeat` times, each in a fresh spawned process"""
+    context = multiprocessing.get_context('spawn')
+    runs = []
+    for _ in range(repeat):
+        results = context.Queue()
+        process = context.Process(target=_run_stage, args=(name, corpus, settings, env, results))
+        process.start()
+        run = results.get()
+        process.join()
+        if 'error' in run:
+            return run
+        runs.append(run)
+
+    latencies = [latency for run in runs for latency in run['latencies']]
+    seconds = sorted(run['seconds'] for run in runs)[len(runs) // 2]
+    return {
+        'stage': name,
+        'items': runs[0]['items'],
+        'seconds': round(seconds, 4),
+        'per_sec': round(runs[0]['items'] / seconds, 1) if seconds > 0 else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 4),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 4),
+        'rss_baseline_mb': max(run['rss_baseline_mb'] for run in runs),
+        'rss_peak_mb': max(run['rss_peak_mb'] for run in runs),
+    }
+
+
+# ---------------------------------------------------------------- reporting
+
+def print_report(results):
+    print(f"{'stage':<14}{'items':>10}{'seconds':>10}{'items/s':>13}{'p50 ms':>11}{'p99 ms':>11}{'peak MB':>10}")
+    for result in results:
+        if 'error' in result:
+            print(f"{result['stage']:<14}  failed: {result['error']}")
+            continue
+        print(f"{result['stage']:<14}{result['items']:>10}{result['seconds']:>10.3f}{result['per_sec']:>13,.0f}"
+              f"{result['p50_ms']:>11.3f}{result['p99_ms']:>11.3f}{result['rss_peak_mb']:>10.1f}")
+
+
+def compare(results, baseline, tolerance):
+    """Stages whose throughput fell more than tolerance below the baseline run"""
+    previous = {result['stage']: result for result in baseline['results'] if 'error' not in result}
+    regressions = []
+    for result in results:
+        before = previous.get(result['stage'])
+        if before is None or 'error' in result or not before['per_sec']:
+            continue
+        change = result['per_sec'] / before['per_sec'] - 1
+        if change < -tolerance:
+            regressions.append((result['stage'], before['per_sec'], result['per_sec'], change))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    corpus = parser.add_argument_group('corpus')
+    corpus.add_argument('--rows', type=int, default=100000)
+    corpus.add_argument('--duplicate-rate', type=float, default=0.1)
+    corpus.add_argument('--malformed-rate', type=float, default=0.05)
+    corpus.add_argument('--domains', type=int, default=5000, help='distinct domains in the pool')
+    corpus.add_argument('--zipf', type=float, default=1.1, help='domain popularity skew (0 = uniform)')
+    corpus.add_argument('--format', choices=('csv', 'zip'), default='csv')
+    corpus.add_argument('--seed', type=int, default=42)
+    dns = parser.add_argument_group('stub resolver')
+    dns.add_argument('--latency-ms', type=float, default=2.0)
+    dns.add_argument('--jitter-ms', type=float, default=1.0)
+    dns.add_argument('--drop-rate', type=float, default=0.0)
+    dns.add_argument('--servfail-rate', type=float, default=0.0)
+    dns.add_argument('--nxdomain-rate', type=float, default=0.05)
+    run = parser.add_argument_group('run')
+    run.add_argument('--stages', default=','.join(STAGES), help='comma-separated subset of ' + ', '.join(STAGES))
+    run.add_argument('--repeat', type=int, default=3)
+    run.add_argument('--dns-sample', type=int, default=2000, help='domains timed one by one in the dns stage')
+    run.add_argument('--json', help='write results to this file')
+    run.add_argument('--compare', help='baseline JSON from an earlier --json run')
+    run.add_argument('--tolerance', type=float, default=0.15, help='allowed throughput drop vs. baseline')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise SystemExit(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    corpus_settings = {'rows': args.rows, 'duplicate_rate': args.duplicate_rate,
+                       'malformed_rate': args.malformed_rate, 'domains': args.domains,
+                       'zipf': args.zipf, 'seed': args.seed}
+    stub = StubDNSServer(latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                         drop_rate=args.drop_rate, servfail_rate=args.servfail_rate,
+                         nxdomain_rate=args.nxdomain_rate, seed=args.seed)
+
+    with tempfile.TemporaryDirectory(prefix='email-bench-') as workdir, stub:
+        emails = generate_emails(**corpus_settings)
+        path = os.path.join(workdir, f"corpus.{args.format}")
+        (write_zip if args.format == 'zip' else write_csv)(path, emails, seed=args.seed)
+        print(f"Corpus: {len(emails)} rows, {os.path.getsize(path) / 1e6:.1f} MB {args.format}, "
+              f"seed {args.seed}; stub DNS at {stub.address}")
+        emails = None
+
+        # Cold caches every run: no verdict DB, async backend against the stub
+        env = {'DNS_BACKEND': 'async', 'DNS_RESOLVER': stub.address, 'VERDICT_DB': ''}
+        settings = {'corpus': corpus_settings, 'dns_sample': args.dns_sample, 'workdir': workdir}
+        results = []
+        for stage in stages:
+            results.append(run_stage(stage, path, settings, env, repeat=args.repeat))
+            print(f"  {stage} done", file=sys.stderr)
+
+    print_report(results)
+    report = {'settings': vars(args), 'python': sys.version.split()[0], 'results': results}
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for stage, before, after, change in regressions:
+            print(f"REGRESSION {stage}: {before:,.0f} -> {after:,.0f} items/s ({change:+.1%})")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
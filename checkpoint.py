@@ -0,0 +1,184 @@
+"""
+Resumable job checkpoints
+Each job keeps its upload, an append-only result file and a JSON manifest
+in one directory. The manifest records how many result batches are safely
+on disk, so a restarted process resumes the job instead of redoing it.
+"""
+
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from results import STATUS_LABELS, read_batches
+
+try:
+    import fcntl
+except ImportError:  # no cross-process claim outside POSIX
+    fcntl = None
+
+MANIFEST = 'manifest.json'
+RESULTS = 'results.bin'
+LOCK = '.lock'
+
+
+class JobCheckpoint:
+    """Upload, results and progress marker of one job"""
+
+    def __init__(self, directory, state):
+        self.directory = directory
+        self.state = state
+        self._lock_file = None
+
+    @property
+    def job_id(self):
+        return self.state['job_id']
+
+    @property
+    def input_path(self):
+        return os.path.join(self.directory, self.state['input'])
+
+    @property
+    def results_path(self):
+        return os.path.join(self.directory, RESULTS)
+
+    @property
+    def batches(self):
+        return self.state['batches']
+
+    @classmethod
+    def begin(cls, root, job_id, filename, **state):
+        """New checkpoint directory claimed by this process; not resumable until commit()"""
+        staging = os.path.join(root, '.' + job_id)
+        os.makedirs(staging)
+        checkpoint = cls(staging, dict(state, **{
+            'job_id': job_id,
+            'filename': filename,
+            'input': 'input' + input_suffix(filename),
+            'batches': 0,
+            'offset': 0,
+            'created_at': time.time(),
+        }))
+        # Claim before the directory is visible (the lock survives the rename), so a
+        # starting process never mistakes it for an abandoned upload
+        checkpoint.claim()
+        checkpoint.directory = os.path.join(root, job_id)
+        os.rename(staging, checkpoint.directory)
+        return checkpoint
+
+    @classmethod
+    def create(cls, root, job_id, upload_path, filename, **state):
+        """Move an upload into a new, claimed checkpoint directory; state holds the job's options"""
+        checkpoint = cls.begin(root, job_id, filename, **state)
+        os.replace(upload_path, checkpoint.input_path)
+        checkpoint.commit()
+        return checkpoint
+
+    def commit(self):
+        """Mark the input complete: from now on a restarted process can resume the job"""
+        self._write_manifest()
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, MANIFEST), encoding='utf-8') as f:
+            return cls(directory, json.load(f))
+
+    def claim(self):
+        """Take the job for this process; False if another live process holds it"""
+        if fcntl is None:
+            return True
+        lock_file = open(os.path.join(self.directory, LOCK), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def open_results(self):
+        """Result file positioned after the last checkpointed batch; later writes are dropped"""
+        results = open(self.results_path, 'ab+')
+        results.truncate(self.state['offset'])
+        results.seek(0, os.SEEK_END)
+        return results
+
+    def saved_batches(self):
+        """The checkpointed result batches
+
+        Only the first `offset` bytes count: anything after them was written
+        but never saved, and may end in a partial batch.
+        """
+        if not self.state['offset']:
+            return
+        with open(self.results_path, 'rb') as results:
+            for batch in read_batches(results):
+                yield batch
+                if results.tell() >= self.state['offset']:
+                    return
+
+    def completed_counts(self):
+        """Input rows per status code in the checkpointed batches"""
+        counts = np.zeros(len(STATUS_LABELS), dtype=np.int64)
+        for batch in self.saved_batches():
+            counts += batch.counts()
+        return counts
+
+    def save(self, results, batches, **state):
+        """Make the first `batches` result batches durable and record them"""
+        results.flush()
+        os.fsync(results.fileno())
+        self.state.update(state, batches=batches, offset=results.tell(), saved_at=time.time())
+        self._write_manifest()
+
+    def _write_manifest(self):
+        path = os.path.join(self.directory, MANIFEST)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+    def release(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def remove(self):
+        self.release()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def input_suffix(filename):
+    """Extension kept on the stored input so its reader can be picked again, e.g. '.ndjson.gz'"""
+    stem, suffix = os.path.splitext(filename.lower())
+    if suffix == '.gz':
+        suffix = os.path.splitext(stem)[1] + suffix
+    return suffix
+
+
+def pending(root):
+    """Checkpoints of unfinished jobs under root, oldest first
+
+    Directories without a manifest are uploads cut off before they were
+    complete; those no live process holds are removed.
+    """
+    checkpoints = []
+    if not os.path.isdir(root):
+        return checkpoints
+    for name in os.listdir(root):
+        directory = os.path.join(root, name)
+        if name.startswith('.') or not os.path.isdir(directory):
+            continue
+        if not os.path.isfile(os.path.join(directory, MANIFEST)):
+            abandoned = JobCheckpoint(directory, {})
+            if abandoned.claim():
+                abandoned.remove()
+            continue
+        try:
+            checkpoints.append(JobCheckpoint.load(directory))
+        except (OSError, ValueError):
+            continue
+    return sorted(checkpoints, key=lambda checkpoint: checkpoint.state['created_at'])
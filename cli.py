@@ -0,0 +1,185 @@
+"""
+Command-line batch validation
+Runs the same pipeline as the web app over local files, without Flask or
+an upload size limit
+Run: python cli.py exports/*.csv archive.zip -o results.csv
+     python cli.py 'lists/**/*.zip' --format ndjson --jobs 4 --concurrency 500 > results.ndjson
+"""
+
+import argparse
+import csv
+import glob
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import log_config
+import pipeline
+from dedup import deduplicate
+from ingest import MAX_ZIP_MEMBERS, MAX_ZIP_UNCOMPRESSED, extract_emails, process_zip
+from jobs import Job
+from results import RESULT_FIELDS
+
+log = logging.getLogger('email_validator.cli')
+
+def expand_inputs(patterns):
+    """Paths for a mix of plain paths and (recursive) glob patterns, in order, without repeats"""
+    paths = []
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern, recursive=True))
+            if not matches:
+                log.warning("Pattern matched no files", extra={'pattern': pattern})
+            paths.extend(match for match in matches if os.path.isfile(match))
+        else:
+            paths.append(pattern)
+    return list(dict.fromkeys(paths))
+
+
+class ResultWriter:
+    """Serializes result batches from concurrent files into one CSV or NDJSON stream"""
+
+    def __init__(self, stream, fmt='csv', kind='all', with_source=False):
+        self.stream = stream
+        self.fmt = fmt
+        self.kind = kind
+        self.fields = RESULT_FIELDS + (['Source'] if with_source else [])
+        self.rows = 0
+        self._lock = threading.Lock()
+        if fmt == 'csv':
+            csv.writer(stream, lineterminator='\n').writerow(self.fields)
+
+    def render(self, batch, source):
+        """Output text for a ResultBatch, built outside the lock"""
+        rows = batch.rows()
+        if 'Source' in self.fields:
+            rows = (row + (source,) for row in rows)
+        if self.fmt == 'csv':
+            buffer = io.StringIO()
+            csv.writer(buffer, lineterminator='\n').writerows(rows)
+            return buffer.getvalue()
+        return ''.join(json.dumps(dict(zip(self.fields, row)), ensure_ascii=False) + '\n' for row in rows)
+
+    def write(self, batch, source=None):
+        batch = batch.select(self.kind)
+        if not len(batch):
+            return
+        text = self.render(batch, source)
+        with self._lock:
+            self.stream.write(text)
+            self.rows += len(batch)
+
+
+def read_emails(path):
+    if path.lower().endswith('.zip'):
+        return process_zip(path, max_members=MAX_ZIP_MEMBERS, max_uncompressed=MAX_ZIP_UNCOMPRESSED)
+    return extract_emails(path)
+
+
+def validate_file(path, writer, fold_aliases=False, budget=None, incremental=False):
+    """Extract, deduplicate and validate one input; returns its job snapshot"""
+    job = Job(filename=path)
+    deadline = time.monotonic() + budget if budget else None
+    job.set_status('parsing')
+    try:
+        with pipeline.STAGE_SECONDS.time(stage='parse'):
+            emails = read_emails(path)
+        if not emails:
+            raise ValueError('No valid emails found')
+        with pipeline.STAGE_SECONDS.time(stage='dedup'):
+            unique = deduplicate(emails, fold_aliases=fold_aliases)
+        emails = None
+        job.set_status('validating', total=unique.rows, unique=len(unique.unique))
+        batches = pipeline.iter_validation_batches(unique.unique, job, counts=unique.counts, deadline=deadline,
+                                                   incremental=incremental)
+        for batch in batches:
+            writer.write(batch, source=path)
+        job.finish()
+    except Exception as e:
+        log.exception("Input failed", extra={'input': path})
+        job.finish(error=str(e))
+    return job.snapshot()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Validate email addresses in CSV/ZIP files without the web server')
+    parser.add_argument('inputs', nargs='+', help='CSV or ZIP files, or glob patterns (quote them; ** recurses)')
+    parser.add_argument('-o', '--output', default='-', help='output file (default stdout)')
+    parser.add_argument('-f', '--format', choices=('csv', 'ndjson'),
+                        help='output format (default from the output extension, else csv)')
+    parser.add_argument('--type', choices=('valid', 'invalid', 'all'), default='all', help='rows to write')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='input files validated at the same time')
+    parser.add_argument('-c', '--concurrency', type=int, help='ceiling on in-flight DNS lookups')
+    parser.add_argument('--backend', choices=('async', 'socket'), help='DNS backend (default DNS_BACKEND or async)')
+    parser.add_argument('--resolver', help='nameserver(s) for the async backend, host[:port][,host[:port]]')
+    parser.add_argument('--deadline', type=float, help='seconds per input before remaining domains are Unchecked')
+    parser.add_argument('--fold-aliases', action='store_true', help='merge Gmail dots and +tag aliases')
+    parser.add_argument('--verdict-db', help="SQLite verdict cache path ('' disables)")
+    parser.add_argument('--incremental', action='store_true',
+                        help='reuse outcomes of addresses checked within --max-age instead of re-checking them')
+    parser.add_argument('--max-age', type=float, help='seconds an address outcome stays reusable (default 7 days)')
+    parser.add_argument('--address-db', help="SQLite address index path ('' disables)")
+    parser.add_argument('--log-level', default=os.environ.get('LOG_LEVEL', 'INFO'))
+    parser.add_argument('--log-format', choices=('logfmt', 'json'), default=os.environ.get('LOG_FORMAT', 'logfmt'))
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    log_config.configure(args.log_level, args.log_format)
+
+    settings = {}
+    if args.concurrency:
+        settings['DNS_MAX_CONCURRENCY'] = settings['DNS_MAX_THREADS'] = args.concurrency
+    if args.backend:
+        settings['DNS_BACKEND'] = args.backend
+    if args.resolver:
+        settings['DNS_RESOLVER'] = args.resolver
+    if args.verdict_db is not None:
+        settings['VERDICT_DB'] = args.verdict_db
+    if args.address_db is not None:
+        settings['ADDRESS_DB'] = args.address_db
+    if args.max_age is not None:
+        settings['ADDRESS_MAX_AGE'] = args.max_age
+    if settings:
+        pipeline.configure(**settings)
+    pipeline.warm_start()
+
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        log.error("No input files")
+        return 2
+
+    fmt = args.format or ('ndjson' if args.output.endswith(('.ndjson', '.jsonl')) else 'csv')
+    stream = sys.stdout if args.output == '-' else open(args.output, 'w', newline='', encoding='utf-8')
+    started = time.perf_counter()
+    try:
+        writer = ResultWriter(stream, fmt, args.type, with_source=len(paths) > 1)
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+            snapshots = list(executor.map(
+                lambda path: validate_file(path, writer, args.fold_aliases, args.deadline, args.incremental), paths))
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+        else:
+            stream.flush()
+
+    failed = [snapshot for snapshot in snapshots if snapshot['status'] == 'failed']
+    for snapshot in snapshots:
+        log.info("Input finished", extra={
+            'input': snapshot['filename'], 'status': snapshot['status'], 'rows': snapshot['total'],
+            'unique': snapshot['unique'], 'valid': snapshot['valid'], 'invalid': snapshot['invalid'],
+            'unchecked': snapshot['unchecked'], 'seconds': snapshot['elapsed'],
+        })
+    log.info("Done", extra={'inputs': len(paths), 'failed': len(failed), 'rows_written': writer.rows,
+                            'seconds': round(time.perf_counter() - started, 3)})
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
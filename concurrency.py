@@ -0,0 +1,216 @@
+"""
+Adaptive concurrency control
+AIMD limit on in-flight lookups: grows while latency stays near its
+baseline and nothing times out, backs off multiplicatively otherwise.
+Also per-key single-flight coalescing and circuit breaking for lookups
+that keep timing out.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+
+class AdaptiveLimit:
+    """AIMD concurrency limit driven by observed latency and timeouts"""
+
+    def __init__(self, initial=30, min_limit=4, max_limit=1000, backoff=0.7,
+                 tolerance=3.0, smoothing=0.1):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.inflight = 0
+        self.samples = 0
+        self.drops = 0
+        self.latency = None
+        self.baseline = None
+        self.drop_rate = 0.0
+        self._limit = float(min(max(initial, min_limit), max_limit))
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    def record(self, latency, dropped=False):
+        """Feed one completed request: its latency, or dropped=True on timeout"""
+        now = time.monotonic()
+        with self._lock:
+            self.samples += 1
+            self.drop_rate += self.smoothing * ((1.0 if dropped else 0.0) - self.drop_rate)
+            if dropped:
+                self.drops += 1
+                # A timeout reports on conditions one timeout ago, so cut at most once per timeout
+                self._decrease(now, latency)
+                return
+
+            self.latency = latency if self.latency is None else \
+                self.latency + self.smoothing * (latency - self.latency)
+            # Baseline follows new minimums at once and creeps up slowly otherwise
+            if self.baseline is None or latency < self.baseline:
+                self.baseline = latency
+            else:
+                self.baseline += 0.01 * (latency - self.baseline)
+
+            if self.latency > self.baseline * self.tolerance:
+                self._decrease(now, self.latency)
+            else:
+                # Additive increase: roughly +1 per limit's worth of successes
+                self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+
+    def _decrease(self, now, window):
+        # At most one cut per window, so a burst of bad samples counts once
+        if now - self._last_decrease < window:
+            return
+        self._limit = max(self.min_limit, self._limit * self.backoff)
+        self._last_decrease = now
+
+    def stats(self):
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'inflight': self.inflight,
+                'latency_ms': round(self.latency * 1000, 2) if self.latency is not None else None,
+                'baseline_ms': round(self.baseline * 1000, 2) if self.baseline is not None else None,
+                'drop_rate': round(self.drop_rate, 4),
+                'samples': self.samples,
+                'drops': self.drops,
+            }
+
+
+class ThreadGate:
+    """Blocks worker threads while in-flight work is at the adaptive limit"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self.limit.inflight < self.limit.limit)
+            self.limit.inflight += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.limit.inflight -= 1
+                self._cond.notify_all()
+
+
+class AsyncGate:
+    """Event-loop counterpart of ThreadGate; use from a single loop"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._waiters = deque()
+
+    async def acquire(self):
+        while self.limit.inflight >= self.limit.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # We were woken but won't take the slot; pass the wake-up on
+                    self._wake()
+                raise
+        self.limit.inflight += 1
+
+    def release(self):
+        self.limit.inflight -= 1
+        self._wake()
+
+    def _wake(self):
+        free = self.limit.limit - self.limit.inflight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+
+class SingleFlight:
+    """Concurrent calls for the same key share one execution and its result"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+        if not leader:
+            return call.result()
+
+        try:
+            result = func()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class CircuitBreaker:
+    """Per-key breaker: opens after consecutive timeouts, lets one probe through per cooldown"""
+
+    def __init__(self, threshold=3, cooldown=60.0, max_keys=100000):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_keys = max_keys
+        self.trips = 0
+        self.rejected = 0
+        self._failures = {}  # key -> [consecutive timeouts, opened_at]
+        self._lock = threading.Lock()
+
+    def allow(self, key):
+        """False while the key's breaker is open"""
+        with self._lock:
+            state = self._failures.get(key)
+            if state is None or state[0] < self.threshold:
+                return True
+            now = time.monotonic()
+            if now - state[1] >= self.cooldown:
+                # Half-open: this caller probes, everyone else waits another cooldown
+                state[1] = now
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, key, timed_out):
+        with self._lock:
+            if not timed_out:
+                self._failures.pop(key, None)
+                return
+            state = self._failures.setdefault(key, [0, 0.0])
+            state[0] += 1
+            if state[0] >= self.threshold:
+                if state[0] == self.threshold:
+                    self.trips += 1
+                state[1] = time.monotonic()
+            if len(self._failures) > self.max_keys:
+                self._failures.pop(next(iter(self._failures)))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'open': sum(1 for count, _ in self._failures.values() if count >= self.threshold),
+                'tracked': len(self._failures),
+                'trips': self.trips,
+                'rejected': self.rejected,
+            }
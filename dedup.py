@@ -0,0 +1,160 @@
+"""
+Address deduplication
+Collapses repeated (and optionally aliased) addresses before validation
+while keeping occurrence counts and a row -> unique-address mapping
+"""
+
+import os
+import tempfile
+import zlib
+from array import array
+
+import numpy as np
+
+MAX_IN_MEMORY_KEYS = 5000000
+SPILL_PARTITIONS = 64
+
+# Providers that ignore dots in the local part and/or support +tag sub-addressing
+DOTLESS_DOMAINS = {'gmail.com': 'gmail.com', 'googlemail.com': 'gmail.com'}
+PLUS_TAG_DOMAINS = {
+    'gmail.com', 'googlemail.com', 'outlook.com', 'hotmail.com', 'live.com', 'msn.com',
+    'icloud.com', 'me.com', 'fastmail.com', 'protonmail.com', 'proton.me', 'zoho.com', 'yandex.com',
+}
+
+
+def canonical_key(email, fold_aliases=False):
+    """Dedup key for an address; with fold_aliases, provider aliases share a key"""
+    email = email.lower()
+    if not fold_aliases or '@' not in email:
+        return email
+
+    local, domain = email.rsplit('@', 1)
+    if domain in PLUS_TAG_DOMAINS:
+        local = local.split('+', 1)[0]
+    if domain in DOTLESS_DOMAINS:
+        local = local.replace('.', '')
+        domain = DOTLESS_DOMAINS[domain]
+    return f"{local}@{domain}"
+
+
+class DedupResult:
+    """Unique addresses (first-seen spelling) plus counts and the row mapping"""
+
+    def __init__(self, unique, row_to_unique):
+        self.unique = unique
+        self.row_to_unique = row_to_unique
+        self.counts = np.bincount(row_to_unique, minlength=len(unique))
+
+    @property
+    def rows(self):
+        return len(self.row_to_unique)
+
+    @property
+    def duplicates(self):
+        return self.rows - len(self.unique)
+
+    def source_rows(self, unique_index):
+        """Input row numbers that collapsed into one unique address"""
+        return np.flatnonzero(self.row_to_unique == unique_index)
+
+
+def deduplicate(emails, fold_aliases=False, max_keys=MAX_IN_MEMORY_KEYS, spill_dir=None,
+                partitions=SPILL_PARTITIONS):
+    """Exact dedup in memory; past max_keys distinct keys, hash-partition via disk"""
+    row_to_unique = np.empty(len(emails), dtype=np.int64)
+    index = {}
+    unique = []
+
+    for row, email in enumerate(emails):
+        key = canonical_key(email, fold_aliases)
+        slot = index.get(key)
+        if slot is None:
+            if len(index) >= max_keys:
+                return _deduplicate_partitioned(emails, fold_aliases, spill_dir, partitions)
+            slot = index[key] = len(unique)
+            unique.append(email)
+        row_to_unique[row] = slot
+
+    return DedupResult(unique, row_to_unique)
+
+
+def _deduplicate_partitioned(emails, fold_aliases, spill_dir, partitions):
+    """Spill row numbers to per-hash partitions, then dedup one partition at a time"""
+    if spill_dir:
+        os.makedirs(spill_dir, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(dir=spill_dir, prefix='dedup-') as tmp:
+        paths = [os.path.join(tmp, f"{part}.rows") for part in range(partitions)]
+        buffers = [array('q') for _ in range(partitions)]
+        files = [open(path, 'wb') for path in paths]
+        try:
+            for row, email in enumerate(emails):
+                # A stable hash (unlike the salted built-in) gives every process the same order
+                part = zlib.crc32(canonical_key(email, fold_aliases).encode('utf-8', 'surrogatepass')) % partitions
+                buffers[part].append(row)
+                if len(buffers[part]) >= 65536:
+                    buffers[part].tofile(files[part])
+                    buffers[part] = array('q')
+            for part in range(partitions):
+                buffers[part].tofile(files[part])
+        finally:
+            for f in files:
+                f.close()
+
+        # Equal keys always land in the same partition, so each one dedups alone
+        row_to_unique = np.empty(len(emails), dtype=np.int64)
+        unique = []
+        for path in paths:
+            rows = np.fromfile(path, dtype=np.int64)
+            index = {}
+            for row in rows.tolist():
+                email = emails[row]
+                key = canonical_key(email, fold_aliases)
+                slot = index.get(key)
+                if slot is None:
+                    slot = index[key] = len(unique)
+                    unique.append(email)
+                row_to_unique[row] = slot
+
+    return DedupResult(unique, row_to_unique)
+
+
+class StreamingDedup:
+    """Dedup across the chunks of a stream: per distinct address, its input rows and a status byte
+
+    Only keys are kept, not the addresses' spellings, so each chunk's new
+    addresses can be validated and written out while the index stays small.
+    """
+
+    PENDING = 255
+
+    def __init__(self, fold_aliases=False):
+        self.fold_aliases = fold_aliases
+        self.rows = 0
+        self.ids = {}
+        self.counts = array('Q')
+        self.status = bytearray()  # per address, set by the caller; PENDING until then
+        self.revised = False  # set by the caller once a count changes after its address was written out
+
+    def __len__(self):
+        return len(self.ids)
+
+    def key(self, email):
+        return canonical_key(email, self.fold_aliases)
+
+    def add(self, key, count):
+        """Count `count` more rows for a key; returns its ID and whether it is new"""
+        self.rows += count
+        uid = self.ids.get(key)
+        if uid is not None:
+            self.counts[uid] += count
+            return uid, False
+        uid = self.ids[key] = len(self.counts)
+        self.counts.append(count)
+        self.status.append(self.PENDING)
+        return uid, True
+
+    def occurrences(self, emails):
+        """Input rows so far behind each of the (already added) addresses"""
+        return np.fromiter((self.counts[self.ids[self.key(email)]] for email in emails),
+                           dtype=np.uint32, count=len(emails))
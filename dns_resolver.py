@@ -0,0 +1,579 @@
+"""
+Asyncio DNS resolver
+Sends raw UDP DNS queries from a single event loop, so thousands of
+lookups can be in flight without one OS thread per lookup
+"""
+
+import asyncio
+import contextvars
+import os
+import random
+import socket
+import struct
+import threading
+import time
+from collections import namedtuple
+
+from concurrency import AdaptiveLimit, AsyncGate
+from domain_cache import DomainCache
+
+TYPE_A = 1
+TYPE_NS = 2
+TYPE_CNAME = 5
+TYPE_SOA = 6
+TYPE_MX = 15
+TYPE_AAAA = 28
+
+CLASS_IN = 1
+
+RCODE_NOERROR = 0
+RCODE_SERVFAIL = 2
+RCODE_NXDOMAIN = 3
+
+DEFAULT_NAMESERVER = ('8.8.8.8', 53)
+
+# Domains check_many keeps in flight per slot of the adaptive query limit
+WINDOW_PER_SLOT = 2
+
+# Outcome of a cached lookup
+ANSWER = 'answer'
+NXDOMAIN = 'nxdomain'
+NODATA = 'nodata'
+
+Record = namedtuple('Record', ['name', 'rtype', 'ttl', 'value'])
+Answer = namedtuple('Answer', ['status', 'records', 'ttl'])
+
+
+def error_verdict():
+    """Verdict for a domain whose lookup failed (timeout, SERVFAIL, ...)"""
+    return {'exists': False, 'mx': False, 'deliverable': False, 'error': True, 'ttl': None}
+
+
+def timeout_verdict():
+    """Error verdict for a domain whose nameservers never answered"""
+    verdict = error_verdict()
+    verdict['timeout'] = True
+    return verdict
+
+
+class _Budget:
+    """Deadline clock of one domain verdict; it stops while the domain's queries only wait for a slot
+
+    Time queued behind the adaptive gate says nothing about the domain, so
+    it must not turn a healthy domain into a timeout (and trip its breaker).
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.queued = 0
+        self.active = 0
+        self.used = 0.0
+        self._since = time.monotonic()  # None while stopped
+
+    def update(self, queued=0, active=0):
+        now = time.monotonic()
+        if self._since is not None:
+            self.used += now - self._since
+        self.queued += queued
+        self.active += active
+        self._since = now if self.active or not self.queued else None
+
+    def remaining(self):
+        used = self.used
+        if self._since is not None:
+            used += time.monotonic() - self._since
+        return self.seconds - used
+
+
+# Budget of the check_domain() call a query belongs to, if it has one
+_budget = contextvars.ContextVar('dns_budget', default=None)
+
+
+class DNSError(Exception):
+    """Malformed packet or failed lookup"""
+
+
+class DNSTimeout(DNSError):
+    """No reply from any nameserver within the retry budget"""
+
+
+def _raise_lookup_error(results):
+    """Raise the first DNSTimeout among gathered results, else the first DNSError, if any"""
+    errors = [result for result in results if isinstance(result, DNSError)]
+    for error in errors:
+        if isinstance(error, DNSTimeout):
+            raise error
+    if errors:
+        raise errors[0]
+
+
+def parse_address(value, default_port=53):
+    """Parse 'host', 'host:port' or '[v6addr]:port' into (host, port)"""
+    value = value.strip()
+    if value.startswith('['):
+        host, _, rest = value[1:].partition(']')
+        port = rest.lstrip(':')
+        return host, int(port) if port else default_port
+    if value.count(':') == 1:
+        host, port = value.split(':')
+        return host, int(port)
+    return value, default_port
+
+
+def system_nameservers(path='/etc/resolv.conf'):
+    """Nameservers from DNS_RESOLVER (comma separated) or resolv.conf"""
+    env = os.environ.get('DNS_RESOLVER')
+    if env:
+        return [parse_address(part) for part in env.split(',') if part.strip()]
+
+    servers = []
+    try:
+        with open(path) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] == 'nameserver':
+                    servers.append((parts[1].split('%')[0], 53))
+    except OSError:
+        pass
+    return servers or [DEFAULT_NAMESERVER]
+
+
+def encode_name(name):
+    """Encode a domain name into DNS wire format"""
+    out = bytearray()
+    for label in name.rstrip('.').split('.'):
+        try:
+            raw = label.encode('ascii')
+        except UnicodeEncodeError:
+            try:
+                raw = label.encode('idna')
+            except UnicodeError:
+                raise DNSError(f"Invalid label in {name!r}")
+        if not raw or len(raw) > 63:
+            raise DNSError(f"Invalid label in {name!r}")
+        out.append(len(raw))
+        out += raw
+    out.append(0)
+    if len(out) > 255:
+        raise DNSError(f"Name too long: {name!r}")
+    return bytes(out)
+
+
+def build_query(qid, name, qtype):
+    """Build a recursive query packet for one question"""
+    header = struct.pack('>HHHHHH', qid, 0x0100, 1, 0, 0, 0)
+    return header + encode_name(name) + struct.pack('>HH', qtype, CLASS_IN)
+
+
+def _read_name(data, offset):
+    labels = []
+    end = None
+    hops = 0
+    while True:
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | data[offset + 1]
+            hops += 1
+            if hops > 64:
+                raise DNSError("Compression loop")
+            continue
+        offset += 1
+        if length == 0:
+            break
+        labels.append(data[offset:offset + length].decode('ascii', 'replace'))
+        offset += length
+    return '.'.join(labels).lower(), (end if end is not None else offset)
+
+
+def _read_rdata(data, offset, rtype, rdlength):
+    if rtype == TYPE_A and rdlength == 4:
+        return socket.inet_ntop(socket.AF_INET, data[offset:offset + 4])
+    if rtype == TYPE_AAAA and rdlength == 16:
+        return socket.inet_ntop(socket.AF_INET6, data[offset:offset + 16])
+    if rtype in (TYPE_CNAME, TYPE_NS):
+        return _read_name(data, offset)[0]
+    if rtype == TYPE_MX:
+        preference = struct.unpack('>H', data[offset:offset + 2])[0]
+        return preference, _read_name(data, offset + 2)[0]
+    if rtype == TYPE_SOA:
+        mname, pos = _read_name(data, offset)
+        rname, pos = _read_name(data, pos)
+        serial, refresh, retry, expire, minimum = struct.unpack('>IIIII', data[pos:pos + 20])
+        return {
+            'mname': mname, 'rname': rname, 'serial': serial, 'refresh': refresh,
+            'retry': retry, 'expire': expire, 'minimum': minimum,
+        }
+    return data[offset:offset + rdlength]
+
+
+def parse_response(data):
+    """Parse a DNS reply into header fields and record sections"""
+    try:
+        qid, flags, qdcount, ancount, nscount, arcount = struct.unpack('>HHHHHH', data[:12])
+        offset = 12
+        for _ in range(qdcount):
+            _, offset = _read_name(data, offset)
+            offset += 4
+
+        sections = []
+        for count in (ancount, nscount):
+            records = []
+            for _ in range(count):
+                name, offset = _read_name(data, offset)
+                rtype, rclass, ttl, rdlength = struct.unpack('>HHIH', data[offset:offset + 10])
+                offset += 10
+                if offset + rdlength > len(data):
+                    raise DNSError("Truncated record")
+                records.append(Record(name, rtype, ttl, _read_rdata(data, offset, rtype, rdlength)))
+                offset += rdlength
+            sections.append(records)
+    except (IndexError, struct.error) as e:
+        raise DNSError(f"Malformed response: {e}")
+
+    return {
+        'id': qid,
+        'rcode': flags & 0x000F,
+        'truncated': bool(flags & 0x0200),
+        'answers': sections[0],
+        'authority': sections[1],
+    }
+
+
+class _DNSProtocol(asyncio.DatagramProtocol):
+    """One UDP socket per nameserver; replies are routed by query ID"""
+
+    def __init__(self):
+        self.transport = None
+        self.pending = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if len(data) < 12:
+            return
+        future = self.pending.get(struct.unpack('>H', data[:2])[0])
+        if future is not None and not future.done():
+            future.set_result(data)
+
+    def error_received(self, exc):
+        # ICMP errors surface here; affected queries simply time out and retry
+        pass
+
+    def connection_lost(self, exc):
+        self.transport = None
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(DNSError("Resolver socket closed"))
+
+
+class AsyncResolver:
+    """Concurrent stub resolver speaking DNS over UDP"""
+
+    def __init__(self, nameservers=None, timeout=2.0, retries=2, max_inflight=2000,
+                 cache_size=100000, max_ttl=86400, initial_inflight=100, deadline=None, on_query=None):
+        self.nameservers = list(nameservers or system_nameservers())
+        self.timeout = timeout
+        # Budget for a whole domain verdict (MX plus host lookups), on top of per-query timeouts
+        self.deadline = deadline
+        # Optional on_query(seconds, outcome) callback per attempt, outcome 'answer' or 'timeout'
+        self.on_query = on_query
+        self.retries = retries
+        self.max_ttl = max_ttl
+        # In-flight queries adapt between 8 and max_inflight to resolver latency/timeouts
+        self.concurrency = AdaptiveLimit(initial=initial_inflight, min_limit=8, max_limit=max_inflight)
+        self._gate = AsyncGate(self.concurrency)
+        # Positive answers keyed by (name, qtype); negative answers per RFC 2308:
+        # NXDOMAIN covers every type for a name, NODATA only the queried type
+        self.records = DomainCache(max_size=cache_size)
+        self.nxdomain = DomainCache(max_size=cache_size)
+        self.nodata = DomainCache(max_size=cache_size)
+        self._inflight = {}
+        self._protocols = {}
+
+    async def _protocol(self, nameserver):
+        protocol = self._protocols.get(nameserver)
+        if protocol is None or protocol.transport is None:
+            loop = asyncio.get_running_loop()
+            _, protocol = await loop.create_datagram_endpoint(_DNSProtocol, remote_addr=nameserver)
+            self._protocols[nameserver] = protocol
+        return protocol
+
+    def _new_id(self, protocol):
+        while True:
+            qid = random.getrandbits(16)
+            if qid not in protocol.pending:
+                return qid
+
+    async def query(self, name, qtype=TYPE_A):
+        """Send one question, retrying across nameservers on timeout"""
+        budget = _budget.get()
+        if budget is not None:
+            budget.update(queued=1)
+        try:
+            await self._gate.acquire()
+        except BaseException:
+            if budget is not None:
+                budget.update(queued=-1)
+            raise
+        if budget is not None:
+            budget.update(queued=-1, active=1)
+        try:
+            loop = asyncio.get_running_loop()
+            for attempt in range(self.retries + 1):
+                nameserver = self.nameservers[attempt % len(self.nameservers)]
+                protocol = await self._protocol(nameserver)
+                qid = self._new_id(protocol)
+                future = loop.create_future()
+                protocol.pending[qid] = future
+                started = time.monotonic()
+                try:
+                    protocol.transport.sendto(build_query(qid, name, qtype))
+                    data = await asyncio.wait_for(future, self.timeout)
+                except asyncio.TimeoutError:
+                    self.concurrency.record(self.timeout, dropped=True)
+                    if self.on_query is not None:
+                        self.on_query(self.timeout, 'timeout')
+                    continue
+                finally:
+                    protocol.pending.pop(qid, None)
+                elapsed = time.monotonic() - started
+                self.concurrency.record(elapsed)
+                if self.on_query is not None:
+                    self.on_query(elapsed, 'answer')
+
+                response = parse_response(data)
+                if response['rcode'] == RCODE_SERVFAIL and attempt < self.retries:
+                    continue
+                return response
+        finally:
+            self._gate.release()
+            if budget is not None:
+                budget.update(active=-1)
+
+        raise DNSTimeout(f"No response for {name}")
+
+    def _negative_ttl(self, response):
+        """Negative TTL from the SOA in the authority section (RFC 2308)"""
+        for record in response['authority']:
+            if record.rtype == TYPE_SOA:
+                return min(record.ttl, record.value['minimum'], self.max_ttl)
+        return 0
+
+    async def _lookup_network(self, name, qtype):
+        response = await self.query(name, qtype)
+        rcode = response['rcode']
+
+        if rcode == RCODE_NXDOMAIN:
+            ttl = self._negative_ttl(response)
+            self.nxdomain.set(name, ttl, ttl)
+            return Answer(NXDOMAIN, [], ttl)
+        if rcode != RCODE_NOERROR:
+            raise DNSError(f"{name}: rcode {rcode}")
+
+        records = [record for record in response['answers'] if record.rtype == qtype]
+        if not records:
+            ttl = self._negative_ttl(response)
+            self.nodata.set((name, qtype), ttl, ttl)
+            return Answer(NODATA, [], ttl)
+
+        ttl = min(min(record.ttl for record in records), self.max_ttl)
+        self.records.set((name, qtype), (records, ttl), ttl)
+        return Answer(ANSWER, records, ttl)
+
+    async def lookup(self, name, qtype):
+        """Cached lookup; concurrent callers for the same question share one query"""
+        name = name.lower().rstrip('.')
+        ttl = self.nxdomain.get(name)
+        if ttl is not None:
+            return Answer(NXDOMAIN, [], ttl)
+
+        key = (name, qtype)
+        ttl = self.nodata.get(key)
+        if ttl is not None:
+            return Answer(NODATA, [], ttl)
+        cached = self.records.get(key)
+        if cached is not None:
+            return Answer(ANSWER, cached[0], cached[1])
+
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            answer = await self._lookup_network(name, qtype)
+            future.set_result(answer)
+            return answer
+        except BaseException as e:
+            future.set_exception(e if isinstance(e, Exception) else DNSError(str(e)))
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def host_has_address(self, host):
+        """True if the host has an A or AAAA record; both are queried at once
+
+        One answer is enough. Without one, a failed lookup is raised rather
+        than read as "no address", since the record may well exist.
+        """
+        answers = await asyncio.gather(self.lookup(host, TYPE_A), self.lookup(host, TYPE_AAAA),
+                                       return_exceptions=True)
+        for answer in answers:
+            if isinstance(answer, BaseException) and not isinstance(answer, DNSError):
+                raise answer
+        if any(isinstance(answer, Answer) and answer.status == ANSWER for answer in answers):
+            return True
+        _raise_lookup_error(answers)
+        return False
+
+    async def check_domain(self, domain):
+        """Mail routing verdict within the resolver's per-domain deadline
+
+        The deadline only counts time the domain's queries spend on the wire
+        (or in the cache), not time queued for an in-flight slot.
+        """
+        if self.deadline is None:
+            return await self._check_domain(domain)
+        budget = _Budget(self.deadline)
+        token = _budget.set(budget)
+        try:
+            # The task, and every query it makes, inherits the budget through its context
+            task = asyncio.ensure_future(self._check_domain(domain))
+        finally:
+            _budget.reset(token)
+        try:
+            while not task.done():
+                remaining = budget.remaining()
+                if remaining <= 0:
+                    task.cancel()
+                    await asyncio.wait({task})
+                    raise DNSTimeout(f"No verdict for {domain} within {self.deadline}s")
+                await asyncio.wait({task}, timeout=remaining)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        return task.result()
+
+    async def _check_domain(self, domain):
+        """Mail routing verdict: MX records, falling back to A/AAAA per RFC 5321"""
+        verdict = {'exists': False, 'mx': False, 'deliverable': False, 'error': False, 'ttl': None}
+
+        mx = await self.lookup(domain, TYPE_MX)
+        verdict['ttl'] = mx.ttl
+        if mx.status == NXDOMAIN:
+            return verdict
+        verdict['exists'] = True
+
+        if mx.status == ANSWER:
+            # A single "." exchange is a null MX (RFC 7505): the domain takes no mail
+            hosts = [host for _, host in sorted(record.value for record in mx.records) if host]
+            if hosts:
+                # Shared exchangers (e.g. Google Workspace) hit the record cache
+                found = await asyncio.gather(*(self.host_has_address(host) for host in hosts),
+                                             return_exceptions=True)
+                for result in found:
+                    if isinstance(result, BaseException) and not isinstance(result, DNSError):
+                        raise result
+                # Any reachable exchanger will do; only if none is, a failed one makes the verdict an error
+                verdict['mx'] = verdict['deliverable'] = any(result is True for result in found)
+                if not verdict['mx']:
+                    _raise_lookup_error(found)
+        else:
+            # No MX: the domain itself is the implicit mail exchanger
+            verdict['deliverable'] = await self.host_has_address(domain)
+
+        return verdict
+
+    async def check_many(self, domains, concurrency=None, timeout=None):
+        """Check many domains through a window of concurrent lookups
+
+        The window follows the adaptive query limit, WINDOW_PER_SLOT domains
+        per slot, so it grows and shrinks with the resolver rather than
+        queueing more lookups than the limit will let through; concurrency
+        caps it. With a timeout, lookups still running when it expires are
+        cancelled and their domains are left out of the result.
+        """
+        verdicts = {}
+        pending = iter(list(domains))
+        running = set()
+        loop = asyncio.get_running_loop()
+        end = None if timeout is None else loop.time() + timeout
+
+        async def check(domain):
+            try:
+                verdicts[domain] = await self.check_domain(domain)
+            except DNSTimeout:
+                verdicts[domain] = timeout_verdict()
+            except Exception:
+                verdicts[domain] = error_verdict()
+
+        try:
+            while True:
+                window = self.concurrency.limit * WINDOW_PER_SLOT
+                if concurrency is not None:
+                    window = min(window, concurrency)
+                while len(running) < window:
+                    domain = next(pending, None)
+                    if domain is None:
+                        break
+                    running.add(asyncio.ensure_future(check(domain)))
+                remaining = None if end is None else end - loop.time()
+                if not running or (remaining is not None and remaining <= 0):
+                    break
+                _, running = await asyncio.wait(running, timeout=remaining,
+                                                return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.wait(running)
+        return verdicts
+
+    def close(self):
+        for protocol in self._protocols.values():
+            if protocol.transport is not None:
+                protocol.transport.close()
+        self._protocols.clear()
+
+
+class ResolverThread:
+    """Runs an AsyncResolver on a dedicated event-loop thread for sync callers"""
+
+    def __init__(self, resolver):
+        self.resolver = resolver
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=self._loop.run_forever, name='dns-resolver', daemon=True)
+                thread.start()
+        return self._loop
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the resolver loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result(timeout)
+
+    def check_domain(self, domain):
+        try:
+            return self.run(self.resolver.check_domain(domain))
+        except DNSTimeout:
+            return timeout_verdict()
+        except DNSError:
+            return error_verdict()
+
+    def check_many(self, domains, concurrency=None, timeout=None):
+        return self.run(self.resolver.check_many(domains, concurrency, timeout))
+
+    def close(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self.resolver.close)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
@@ -0,0 +1,76 @@
+"""
+Domain verdict cache
+Thread-safe in-process cache with LRU eviction and separate TTLs
+for positive and negative verdicts
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class DomainCache:
+    """TTL-bounded LRU cache for domain verdicts"""
+
+    def __init__(self, max_size=100000, positive_ttl=3600, negative_ttl=300):
+        self.max_size = max_size
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, domain, default=None):
+        """Return the cached verdict for a domain, or default if missing/expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(domain)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            verdict, expires_at = entry
+            if expires_at <= now:
+                del self._entries[domain]
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(domain)
+            self.hits += 1
+            return verdict
+
+    def set(self, domain, verdict, ttl=None):
+        """Store a verdict; TTL defaults to the positive or negative TTL"""
+        if ttl is None:
+            ttl = self.positive_ttl if verdict else self.negative_ttl
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            self._entries[domain] = (verdict, time.monotonic() + ttl)
+            self._entries.move_to_end(domain)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': (self.hits / lookups) if lookups else 0.0,
+            }
@@ -0,0 +1,192 @@
+"""
+Domain classification index
+Disposable and free-mail domain lists compiled into an open-addressing
+hash table file that is memory-mapped at startup: no parse step, O(1)
+lookups, and the pages are shared by every process on the host
+Build: python domain_index.py --disposable disposable.txt --free free.txt -o data/domain_index.bin
+"""
+
+import argparse
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# Address types; the position in TYPE_LABELS is the code
+TYPE_UNKNOWN = 0
+TYPE_CORPORATE = 1
+TYPE_FREE = 2
+TYPE_ROLE = 3
+TYPE_DISPOSABLE = 4
+TYPE_LABELS = ('', 'corporate', 'free', 'role', 'disposable')
+
+# Local parts that reach a function or a team rather than a person
+ROLE_ACCOUNTS = frozenset({
+    'abuse', 'accounting', 'accounts', 'admin', 'administrator', 'billing', 'careers', 'contact', 'customerservice',
+    'dev', 'devnull', 'enquiries', 'feedback', 'finance', 'help', 'helpdesk', 'hostmaster', 'hr', 'info', 'jobs',
+    'legal', 'mail', 'mailer-daemon', 'marketing', 'media', 'no-reply', 'noc', 'noreply', 'office', 'orders',
+    'postmaster', 'press', 'privacy', 'root', 'sales', 'security', 'service', 'support', 'sysadmin', 'team',
+    'webmaster',
+})
+
+# Always part of the index, on top of whatever lists are compiled in
+BUILTIN_FREE = (
+    'gmail.com', 'googlemail.com', 'yahoo.com', 'hotmail.com', 'outlook.com', 'live.com', 'msn.com', 'aol.com',
+    'icloud.com', 'me.com', 'mail.com', 'zoho.com', 'protonmail.com', 'proton.me', 'yandex.com', 'yandex.ru',
+    'inbox.com', 'gmx.com', 'gmx.de', 'gmx.net', 'web.de', 'fastmail.com', 'mail.ru', 'qq.com', '163.com',
+)
+BUILTIN_DISPOSABLE = (
+    'mailinator.com', 'guerrillamail.com', 'guerrillamail.net', 'sharklasers.com', '10minutemail.com',
+    'temp-mail.org', 'tempmail.com', 'yopmail.com', 'trashmail.com', 'dispostable.com', 'getnada.com',
+    'maildrop.cc', 'throwawaymail.com', 'fakeinbox.com', 'mailnesia.com', 'mintemail.com', 'spamgourmet.com',
+)
+
+_MAGIC = b'DIX1'
+_HEADER = struct.Struct('<4sQQ')  # magic, slots (a power of two), entries
+
+
+def domain_key(domain):
+    """Non-zero 64-bit hash of a domain; 0 marks an empty slot"""
+    key = int.from_bytes(hashlib.blake2b(domain.encode('utf-8', 'surrogatepass'), digest_size=8).digest(), 'little')
+    return key or 1
+
+
+def suffixes(domain):
+    """The domain and its parents, most specific first, down to two labels"""
+    labels = domain.split('.')
+    return ['.'.join(labels[start:]) for start in range(max(1, len(labels) - 1))]
+
+
+class DomainIndex:
+    """Domain hash -> type table, probed linearly from hash & (slots - 1)"""
+
+    def __init__(self, keys, types, entries, mapping=None):
+        self.keys = keys
+        self.types = types
+        self.entries = entries
+        self._mask = len(keys) - 1
+        self._mapping = mapping  # keeps the mmap alive for the arrays that view it
+
+    @classmethod
+    def build(cls, entries):
+        """In-memory index from {domain: type}"""
+        slots = 1 << max(4, (2 * len(entries)).bit_length())  # load factor at most 1/2
+        keys = np.zeros(slots, dtype='<u8')
+        types = np.zeros(slots, dtype=np.uint8)
+        mask = slots - 1
+        for domain, kind in entries.items():
+            key = domain_key(domain)
+            slot = key & mask
+            while keys[slot] and int(keys[slot]) != key:
+                slot = (slot + 1) & mask
+            keys[slot] = key
+            types[slot] = kind
+        return cls(keys, types, len(entries))
+
+    @classmethod
+    def open(cls, path):
+        """Memory-map a compiled index file"""
+        with open(path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, slots, entries = _HEADER.unpack_from(mapping)
+        if magic != _MAGIC or slots & (slots - 1) or len(mapping) != _HEADER.size + slots * 9:
+            mapping.close()
+            raise ValueError(f"Not a domain index: {path}")
+        keys = np.frombuffer(mapping, dtype='<u8', count=slots, offset=_HEADER.size)
+        types = np.frombuffer(mapping, dtype=np.uint8, count=slots, offset=_HEADER.size + slots * 8)
+        return cls(keys, types, entries, mapping)
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, len(self.keys), self.entries))
+            f.write(self.keys.tobytes())
+            f.write(self.types.tobytes())
+        os.replace(path + '.tmp', path)
+
+    def get(self, domain):
+        """Type listed for exactly this domain, or TYPE_UNKNOWN"""
+        key = domain_key(domain)
+        slot = key & self._mask
+        while True:
+            found = int(self.keys[slot])
+            if found == key:
+                return int(self.types[slot])
+            if not found:
+                return TYPE_UNKNOWN
+            slot = (slot + 1) & self._mask
+
+    def lookup(self, domain):
+        """Type of a domain or its closest listed parent; unlisted domains are corporate"""
+        for suffix in suffixes(domain):
+            kind = self.get(suffix)
+            if kind:
+                return kind
+        return TYPE_CORPORATE
+
+    def __len__(self):
+        return self.entries
+
+
+def classify(local, domain_type):
+    """Address type from its local part and its domain's type"""
+    if domain_type != TYPE_DISPOSABLE and local.lower().split('+', 1)[0] in ROLE_ACCOUNTS:
+        return TYPE_ROLE
+    return domain_type
+
+
+def builtin_entries():
+    entries = dict.fromkeys(BUILTIN_FREE, TYPE_FREE)
+    entries.update(dict.fromkeys(BUILTIN_DISPOSABLE, TYPE_DISPOSABLE))
+    return entries
+
+
+def load(path):
+    """Compiled index at path, or the built-in lists when there is none"""
+    if path and os.path.exists(path):
+        return DomainIndex.open(path)
+    return DomainIndex.build(builtin_entries())
+
+
+def read_list(path):
+    """Domains from a list file: one per line, '#' comments, optional leading '*.' or '.'"""
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            domain = line.split('#', 1)[0].strip().lower().lstrip('*').lstrip('.')
+            if domain:
+                yield domain
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compile domain lists into a memory-mappable index')
+    parser.add_argument('--disposable', action='append', default=[], help='disposable domain list (repeatable)')
+    parser.add_argument('--free', action='append', default=[], help='free-mail domain list (repeatable)')
+    parser.add_argument('-o', '--output', default=os.path.join('data', 'domain_index.bin'))
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    entries = builtin_entries()
+    for path in args.free:
+        entries.update((domain, TYPE_FREE) for domain in read_list(path) if entries.get(domain) != TYPE_DISPOSABLE)
+    # Disposable wins when a domain is on both kinds of list
+    for path in args.disposable:
+        entries.update((domain, TYPE_DISPOSABLE) for domain in read_list(path))
+
+    index = DomainIndex.build(entries)
+    index.save(args.output)
+    counts = np.bincount(list(entries.values()), minlength=len(TYPE_LABELS))
+    log.info(f"Wrote {args.output}: {len(entries)} domains ({counts[TYPE_DISPOSABLE]} disposable, "
+             f"{counts[TYPE_FREE]} free), {os.path.getsize(args.output)} bytes")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
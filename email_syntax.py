@@ -0,0 +1,99 @@
+"""
+Email syntax checks
+Single-address validation plus a batch pass that yields a validity mask
+and reason codes for a whole column at once
+"""
+
+import re
+
+import numpy as np
+
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9][a-zA-Z0-9._%+-]*@[a-zA-Z0-9][a-zA-Z0-9.-]*\.[a-zA-Z]{2,}$')
+
+# Every check of syntax_reason() folded into one pattern, so the batch pass
+# costs a single C-level match per address
+BATCH_PATTERN = re.compile(
+    r'(?=.{1,254}$)'        # overall length
+    r'(?!.*\.\.)'           # no consecutive dots
+    r'(?=[^@]{1,64}@)'      # local part length
+    r'(?![^@]*\.@)'         # local part does not end with a dot
+    r'[a-zA-Z0-9][a-zA-Z0-9._%+-]*@'
+    r'(?=.{1,253}$)'        # domain length
+    r'[a-zA-Z0-9][a-zA-Z0-9.-]*\.[a-zA-Z]{2,}$'
+)
+
+# Reason codes, in the order the checks are applied
+REASON_OK = 0
+REASON_EMPTY = 1
+REASON_TOO_LONG = 2
+REASON_PATTERN = 3
+REASON_DOUBLE_DOT = 4
+REASON_LOCAL_TOO_LONG = 5
+REASON_DOMAIN_TOO_LONG = 6
+REASON_LOCAL_DOT = 7
+
+REASON_LABELS = {
+    REASON_OK: 'ok',
+    REASON_EMPTY: 'empty',
+    REASON_TOO_LONG: 'address too long',
+    REASON_PATTERN: 'bad format',
+    REASON_DOUBLE_DOT: 'consecutive dots',
+    REASON_LOCAL_TOO_LONG: 'local part too long',
+    REASON_DOMAIN_TOO_LONG: 'domain too long',
+    REASON_LOCAL_DOT: 'local part starts/ends with dot',
+}
+
+BATCH_SIZE = 100000
+
+
+def syntax_reason(email):
+    """Reason code for the first syntax check an address fails"""
+    if not email:
+        return REASON_EMPTY
+    if len(email) > 254:
+        return REASON_TOO_LONG
+
+    if not EMAIL_PATTERN.match(email):
+        return REASON_PATTERN
+
+    if '..' in email:
+        return REASON_DOUBLE_DOT
+
+    local, domain = email.rsplit('@', 1)
+
+    if len(local) > 64:
+        return REASON_LOCAL_TOO_LONG
+    if len(domain) > 253:
+        return REASON_DOMAIN_TOO_LONG
+
+    if local.startswith('.') or local.endswith('.'):
+        return REASON_LOCAL_DOT
+
+    return REASON_OK
+
+
+def validate_email_syntax(email):
+    """Strict email syntax validation"""
+    return syntax_reason(email) == REASON_OK
+
+
+def check_syntax_batch(emails):
+    """Batch validate_email_syntax: returns (valid mask, reason codes) arrays"""
+    match = BATCH_PATTERN.match
+    mask = np.fromiter((bool(email) and match(email) is not None for email in emails),
+                       dtype=bool, count=len(emails))
+    reasons = np.zeros(len(emails), dtype=np.uint8)
+    # Only the failures (typically 5-15%) go through the slow path for a reason
+    for index in np.flatnonzero(~mask):
+        reasons[index] = syntax_reason(emails[index])
+    # The scalar checks are authoritative should the folded pattern ever disagree
+    mask |= reasons == REASON_OK
+    return mask, reasons
+
+
+def iter_syntax_batches(emails, batch_size=BATCH_SIZE):
+    """check_syntax_batch over bounded slices of a long list"""
+    for start in range(0, len(emails), batch_size):
+        batch = emails[start:start + batch_size]
+        mask, reasons = check_syntax_batch(batch)
+        yield batch, mask, reasons
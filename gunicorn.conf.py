@@ -0,0 +1,9 @@
+"""
+gunicorn settings, read from the working directory by default
+Each worker runs the app's startup work once it has loaded the app
+"""
+
+
+def post_worker_init(worker):
+    import main
+    main.startup()
@@ -0,0 +1,424 @@
+"""
+Email ingestion
+Streams addresses out of uploaded files in bounded chunks, reading
+only the email column: CSV (optionally gzipped), NDJSON, plain text,
+Parquet, Arrow IPC/Feather, XLSX and ZIP archives of CSVs
+"""
+
+import codecs
+import csv
+import gzip
+import io
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet and Arrow inputs need pyarrow
+    pa = None
+
+try:
+    import openpyxl
+except ImportError:  # XLSX inputs need openpyxl
+    openpyxl = None
+
+SAMPLE_SIZE = 64 * 1024
+CHUNK_ROWS = 50000
+EMAIL_HEADER_HINTS = ('email', 'mail', 'e-mail')
+EMAIL_SAMPLE_ROWS = 200  # rows inspected to find the email column when no header names it
+
+# Input formats by file extension; a trailing .gz gunzips any of the streamable ones
+FORMATS = {
+    '.csv': 'csv',
+    '.txt': 'text',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.xlsx': 'xlsx',
+    '.zip': 'zip',
+}
+# Formats whose index sits at the end of the file, so they are read from disk rather than a stream
+RANDOM_ACCESS_FORMATS = ('parquet', 'arrow', 'xlsx', 'zip')
+
+MAX_ZIP_MEMBERS = 1000
+MAX_ZIP_UNCOMPRESSED = 2 * 1024 * 1024 * 1024  # 2GB
+
+log = logging.getLogger(__name__)
+
+# Worker processes for parsing archive members, started on first use
+_member_pool = None
+_member_pool_lock = threading.Lock()
+
+
+class ArchiveTooLarge(ValueError):
+    """ZIP exceeds the member count or uncompressed size limits"""
+
+
+class ReaderUnavailable(ValueError):
+    """The optional package that reads this input format is not installed"""
+
+
+def input_format(name):
+    """(format, gzipped) for a file name, e.g. ('ndjson', True) for 'list.ndjson.gz'; CSV when unknown"""
+    name = name.lower()
+    gzipped = name.endswith('.gz')
+    if gzipped:
+        name = name[:-3]
+    fmt = FORMATS.get(os.path.splitext(name)[1], 'csv')
+    if gzipped and fmt in RANDOM_ACCESS_FORMATS:
+        fmt = 'csv'
+    return fmt, gzipped
+
+
+def needs_file(name):
+    """True if an input of this name has to be on disk (seekable) to be read"""
+    return input_format(name)[0] in RANDOM_ACCESS_FORMATS
+
+
+def detect_encoding(sample):
+    """Pick an encoding from a leading byte sample"""
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        sample.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off by the end of the sample is still UTF-8
+        if e.reason == 'unexpected end of data' and e.start >= len(sample) - 3:
+            return 'utf-8'
+        return 'latin-1'
+
+
+def looks_like_email(value):
+    """Same test clean_emails() applies, for a single raw cell"""
+    return isinstance(value, str) and '@' in value and '.' in value
+
+
+def hinted_column(header):
+    """Index of the first header that looks like an email column, or None"""
+    for index, name in enumerate(header):
+        name = str(name).lower()
+        if any(hint in name for hint in EMAIL_HEADER_HINTS):
+            return index
+    return None
+
+
+def sampled_column(rows, width):
+    """Index of the column whose sampled values most often look like emails, or None"""
+    scores = [0] * width
+    for row in rows:
+        for index, value in enumerate(row[:width]):
+            if looks_like_email(value):
+                scores[index] += 1
+    best = max(scores, default=0)
+    return scores.index(best) if best else None
+
+
+def find_email_column(header, rows=()):
+    """Index of the email column: by header name, else by sampled values, else 0"""
+    index = hinted_column(header)
+    if index is None:
+        index = sampled_column(rows, len(header))
+    return 0 if index is None else index
+
+
+def clean_emails(values):
+    """Normalize a chunk of raw cells and keep the ones that look like emails"""
+    values = values.str.strip().str.lower()
+    mask = values.str.contains('@', regex=False) & values.str.contains('.', regex=False)
+    return values[mask].tolist()
+
+
+def _open_binary(source):
+    if isinstance(source, (str, bytes)) or hasattr(source, '__fspath__'):
+        return open(source, 'rb')
+    if isinstance(source, io.BufferedReader):
+        return source
+    return io.BufferedReader(source, SAMPLE_SIZE)
+
+
+def _text_lines(stream, sample):
+    return io.TextIOWrapper(stream, encoding=detect_encoding(sample), errors='replace', newline='')
+
+
+def _csv_chunks(stream, chunk_rows):
+    sample = stream.peek(SAMPLE_SIZE)[:SAMPLE_SIZE]
+    if not sample:
+        return
+    encoding = detect_encoding(sample)
+
+    lines = sample.decode(encoding, errors='replace').splitlines()
+    if len(sample) == SAMPLE_SIZE and len(lines) > 1:
+        lines.pop()  # probably cut off
+    rows = list(csv.reader(lines[:EMAIL_SAMPLE_ROWS + 1]))
+    header = rows[0] if rows else []
+    if not header:
+        return
+    column = find_email_column(header, rows[1:])
+    # No header row if the first line already holds an address in that column
+    has_header = not looks_like_email(header[column])
+
+    # Decoding errors past the sample become U+FFFD instead of a re-read
+    reader = pd.read_csv(
+        stream,
+        encoding=encoding,
+        encoding_errors='replace',
+        header=0 if has_header else None,
+        usecols=[column],
+        dtype=str,
+        na_filter=False,
+        on_bad_lines='skip',
+        chunksize=chunk_rows,
+    )
+    with reader:
+        for chunk in reader:
+            yield clean_emails(chunk.iloc[:, 0])
+
+
+def _text_chunks(stream, chunk_rows):
+    """One address per line; anything else on a line is left to clean_emails()"""
+    sample = stream.peek(SAMPLE_SIZE)[:SAMPLE_SIZE]
+    if not sample:
+        return
+    lines = _text_lines(stream, sample)
+    while True:
+        chunk = list(islice(lines, chunk_rows))
+        if not chunk:
+            return
+        yield clean_emails(pd.Series(chunk, dtype=object))
+
+
+def _ndjson_chunks(stream, chunk_rows):
+    """One JSON object per line; the email key is found in the first chunk and kept for the rest"""
+    sample = stream.peek(SAMPLE_SIZE)[:SAMPLE_SIZE]
+    if not sample:
+        return
+    lines = _text_lines(stream, sample)
+    key = None
+    while True:
+        records = []
+        for line in islice(lines, chunk_rows):
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue  # blank or malformed line
+        if not records:
+            return
+        if key is None:
+            header = list(dict.fromkeys(name for record in records[:EMAIL_SAMPLE_ROWS]
+                                        if isinstance(record, dict) for name in record))
+            rows = [[record.get(name) for name in header] for record in records[:EMAIL_SAMPLE_ROWS]
+                    if isinstance(record, dict)]
+            key = header[find_email_column(header, rows)] if header else ''
+        # Bare JSON strings are addresses as they are
+        values = [record.get(key) if isinstance(record, dict) else record for record in records]
+        yield clean_emails(pd.Series([value if isinstance(value, str) else '' for value in values], dtype=object))
+
+
+def _require(module, package, fmt):
+    if module is None:
+        raise ReaderUnavailable(f"Reading {fmt} files needs the {package} package (pip install {package})")
+
+
+def _arrow_text_columns(schema):
+    return [field.name for field in schema
+            if pa.types.is_string(field.type) or pa.types.is_large_string(field.type)
+            or (pa.types.is_dictionary(field.type) and pa.types.is_string(field.type.value_type))]
+
+
+def _arrow_email_column(names, sample):
+    """Email column among text columns names; sample() returns a table of their first rows"""
+    if not names:
+        return None
+    index = hinted_column(names)
+    if index is None:
+        table = sample()
+        rows = zip(*(table.column(name).to_pylist() for name in names))
+        index = sampled_column(rows, len(names))
+    return names[0 if index is None else index]
+
+
+def _arrow_chunk(array):
+    return clean_emails(array.cast(pa.string()).to_pandas().fillna(''))
+
+
+def _parquet_chunks(source, chunk_rows):
+    """Only the email column's pages are read (column projection), one batch at a time"""
+    _require(pa, 'pyarrow', 'Parquet')
+    parquet = pq.ParquetFile(source)
+    names = _arrow_text_columns(parquet.schema_arrow)
+    column = _arrow_email_column(names, lambda: pa.Table.from_batches(
+        [next(parquet.iter_batches(batch_size=EMAIL_SAMPLE_ROWS, columns=names))]))
+    if column is None:
+        return
+    for batch in parquet.iter_batches(batch_size=chunk_rows, columns=[column]):
+        yield _arrow_chunk(batch.column(0))
+
+
+def _arrow_chunks(source, chunk_rows):
+    """Arrow IPC file (Feather v2); memory-mapped, so only the email column's buffers are touched"""
+    _require(pa, 'pyarrow', 'Arrow')
+    if isinstance(source, (str, bytes)) or hasattr(source, '__fspath__'):
+        source = pa.memory_map(os.fspath(source))
+    reader = pa.ipc.open_file(source)
+    if not reader.num_record_batches:
+        return
+    names = _arrow_text_columns(reader.schema)
+    column = _arrow_email_column(names, lambda: pa.Table.from_batches([reader.get_batch(0).slice(0, EMAIL_SAMPLE_ROWS)]))
+    if column is None:
+        return
+    index = reader.schema.get_field_index(column)
+    for number in range(reader.num_record_batches):
+        array = reader.get_batch(number).column(index)
+        for start in range(0, len(array), chunk_rows):
+            yield _arrow_chunk(array.slice(start, chunk_rows))
+
+
+def _xlsx_chunks(source, chunk_rows):
+    """First worksheet, streamed row by row; only the email column's cells are materialized"""
+    _require(openpyxl, 'openpyxl', 'XLSX')
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        rows = list(sheet.iter_rows(max_row=EMAIL_SAMPLE_ROWS + 1, values_only=True))
+        if not rows:
+            return
+        header = [value if value is not None else '' for value in rows[0]]
+        column = find_email_column(header, rows[1:])
+        first_row = 2 if not looks_like_email(header[column]) else 1
+        cells = sheet.iter_rows(min_row=first_row, min_col=column + 1, max_col=column + 1, values_only=True)
+        while True:
+            chunk = [row[0] if isinstance(row[0], str) else '' for row in islice(cells, chunk_rows)]
+            if not chunk:
+                return
+            yield clean_emails(pd.Series(chunk, dtype=object))
+    finally:
+        workbook.close()
+
+
+STREAM_READERS = {'csv': _csv_chunks, 'text': _text_chunks, 'ndjson': _ndjson_chunks}
+FILE_READERS = {'parquet': _parquet_chunks, 'arrow': _arrow_chunks, 'xlsx': _xlsx_chunks}
+
+
+def iter_email_chunks(source, name=None, chunk_rows=CHUNK_ROWS):
+    """Yield lists of cleaned emails from a path or binary file object, chunk_rows rows at a time
+
+    name (an upload's file name; defaults to the path) picks the reader.
+    Parquet, Arrow and XLSX need a path or seekable file; the rest stream.
+    """
+    if name is None:
+        name = os.fspath(source) if isinstance(source, str) or hasattr(source, '__fspath__') else '.csv'
+    fmt, gzipped = input_format(name)
+    if fmt == 'zip':
+        raise ValueError("ZIP archives are read with iter_emails_from_zip() or process_zip()")
+    if fmt in FILE_READERS:
+        yield from FILE_READERS[fmt](source, chunk_rows)
+        return
+    with _open_binary(source) as stream:
+        if gzipped:
+            stream = io.BufferedReader(gzip.GzipFile(fileobj=stream), SAMPLE_SIZE)
+        yield from STREAM_READERS[fmt](stream, chunk_rows)
+
+
+def iter_emails_from_csv(source, chunk_rows=CHUNK_ROWS):
+    """Yield cleaned emails from a CSV path or binary file object, one chunk at a time"""
+    for chunk in iter_email_chunks(source, '.csv', chunk_rows):
+        yield from chunk
+
+
+def extract_emails(path):
+    """Extract emails from any supported non-archive input"""
+    try:
+        return [email for chunk in iter_email_chunks(path) for email in chunk]
+    except ReaderUnavailable:
+        raise
+    except Exception as e:
+        log.warning("Error reading input", extra={'path': str(path), 'error': str(e)})
+        return []
+
+
+def extract_emails_from_csv(csv_path):
+    """Extract emails from CSV"""
+    try:
+        return list(iter_emails_from_csv(csv_path))
+    except Exception as e:
+        log.warning("Error reading CSV", extra={'path': str(csv_path), 'error': str(e)})
+        return []
+
+
+def csv_members(zip_ref, max_members=MAX_ZIP_MEMBERS, max_uncompressed=MAX_ZIP_UNCOMPRESSED):
+    """CSV entries of an open archive, checked against the size guards"""
+    members = [info for info in zip_ref.infolist()
+               if not info.is_dir() and info.filename.lower().endswith('.csv')]
+
+    if len(members) > max_members:
+        raise ArchiveTooLarge(f"ZIP has {len(members)} CSV files (limit {max_members})")
+    # ZipExtFile stops at the declared size, so the declared total is a hard bound
+    total = sum(info.file_size for info in members)
+    if total > max_uncompressed:
+        raise ArchiveTooLarge(f"ZIP expands to {total} bytes (limit {max_uncompressed})")
+    return members
+
+
+def iter_emails_from_zip(source, **limits):
+    """Yield emails from every CSV member, streamed straight out of the archive"""
+    with zipfile.ZipFile(source) as zip_ref:
+        for info in csv_members(zip_ref, **limits):
+            with zip_ref.open(info) as member:
+                yield from iter_emails_from_csv(member)
+
+
+def _extract_member(zip_path, name):
+    try:
+        with zipfile.ZipFile(zip_path) as zip_ref, zip_ref.open(name) as member:
+            return list(iter_emails_from_csv(member))
+    except Exception as e:
+        log.warning("Error reading ZIP member", extra={'member': name, 'error': str(e)})
+        return []
+
+
+def _get_member_pool():
+    global _member_pool
+    with _member_pool_lock:
+        if _member_pool is None:
+            # spawn: forking a threaded web server is not safe
+            _member_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                               mp_context=multiprocessing.get_context('spawn'))
+    return _member_pool
+
+
+def process_zip(zip_path, parallel=True, **limits):
+    """Extract emails from all CSVs in a ZIP without unpacking it to disk"""
+    try:
+        with zipfile.ZipFile(zip_path) as zip_ref:
+            names = [info.filename for info in csv_members(zip_ref, **limits)]
+    except ArchiveTooLarge:
+        raise
+    except Exception as e:
+        log.warning("Error processing ZIP", extra={'path': str(zip_path), 'error': str(e)})
+        return []
+
+    if not parallel or len(names) < 2:
+        all_emails = []
+        for name in names:
+            all_emails.extend(_extract_member(zip_path, name))
+        return all_emails
+
+    # Members are independent, so parse them side by side in worker processes
+    all_emails = []
+    pool = _get_member_pool()
+    for emails in pool.map(_extract_member, [zip_path] * len(names), names):
+        all_emails.extend(emails)
+    return all_emails
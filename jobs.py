@@ -0,0 +1,178 @@
+"""
+Background validation jobs
+Runs uploads on a worker pool and tracks live progress per job ID
+"""
+
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+
+class Job:
+    """Progress and outcome of one validation run"""
+
+    def __init__(self, filename=None, job_id=None, on_change=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.filename = filename
+        self.status = 'queued'
+        self.error = None
+        self.total = 0
+        self.unique = 0
+        self.processed = 0
+        self.valid = 0
+        self.invalid = 0
+        self.unchecked = 0
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.version = 0
+        self.on_change = on_change  # on_change(job) after every update, with the job locked
+        self._changed = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def _notify(self):
+        self.version += 1
+        self._changed.notify_all()
+        if self.on_change is not None:
+            self.on_change(self)
+
+    def set_status(self, status, total=None, unique=None):
+        with self._changed:
+            self.status = status
+            if total is not None:
+                self.total = total
+            if unique is not None:
+                self.unique = unique
+            if status == 'parsing' and self.started_at is None:
+                self.started_at = time.time()
+            self._notify()
+
+    def advance(self, valid, invalid, unchecked=0):
+        """Record a batch of finished emails; unchecked ones are part of invalid"""
+        with self._changed:
+            self.valid += valid
+            self.invalid += invalid
+            self.unchecked += unchecked
+            self.processed += valid + invalid
+            self._notify()
+
+    def finish(self, error=None):
+        with self._changed:
+            self.status = 'failed' if error else 'done'
+            self.error = error
+            self.finished_at = time.time()
+            self._notify()
+
+    def wait(self, version, timeout):
+        """Block until the job changes past the given version or timeout elapses"""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def state(self):
+        """Raw fields, enough to rebuild snapshots elsewhere (see snapshot_of)"""
+        with self._changed:
+            return {
+                'job_id': self.id,
+                'filename': self.filename,
+                'status': self.status,
+                'error': self.error,
+                'total': self.total,
+                'unique': self.unique,
+                'processed': self.processed,
+                'valid': self.valid,
+                'invalid': self.invalid,
+                'unchecked': self.unchecked,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'version': self.version,
+            }
+
+    def snapshot(self):
+        return snapshot_of(self.state())
+
+
+def snapshot_of(state):
+    """Client-facing job snapshot from Job.state() fields"""
+    start = state['started_at'] or state['created_at']
+    elapsed = (state['finished_at'] or time.time()) - start
+    return {
+        'job_id': state['job_id'],
+        'filename': state['filename'],
+        'status': state['status'],
+        'error': state['error'],
+        'total': state['total'],
+        'unique': state['unique'],
+        'processed': state['processed'],
+        'valid': state['valid'],
+        'invalid': state['invalid'],
+        'unchecked': state['unchecked'],
+        'elapsed': round(elapsed, 3),
+        'rate': round(state['processed'] / elapsed, 1) if elapsed > 0 else 0.0,
+        'version': state['version'],
+    }
+
+
+class JobManager:
+    """Runs jobs on a bounded worker pool and keeps them addressable by ID"""
+
+    # Subclasses that mirror jobs elsewhere define on_change(job)
+    on_change = None
+
+    def __init__(self, max_workers=4):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, filename=None, job_id=None):
+        """Queue func(job, *args) and return the new job immediately; job_id resumes a known job"""
+        job = Job(filename, job_id, self.on_change)
+        with self._lock:
+            self._jobs[job.id] = job
+        if self.on_change is not None:
+            self.on_change(job)
+        self._executor.submit(self._run, job, func, args)
+        return job
+
+    def _run(self, job, func, args):
+        try:
+            func(job, *args)
+            job.finish()
+        except Exception as e:
+            log.exception("Job failed", extra={'job': job.id})
+            job.finish(error=str(e))
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def prune(self, max_age):
+        """Forget finished jobs older than max_age seconds; returns their IDs"""
+        cutoff = time.time() - max_age
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return expired
+
+    def active(self):
+        """Jobs that are waiting for or running on a worker"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def by_status(self):
+        """Number of known jobs in each status; 'queued' is the queue depth"""
+        counts = dict.fromkeys(('queued', 'parsing', 'validating', 'done', 'failed'), 0)
+        with self._lock:
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return counts
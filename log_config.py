@@ -0,0 +1,67 @@
+"""
+Structured logging
+One event per line as logfmt (default) or JSON; pass fields with
+log.info("message", extra={'job': job_id, ...})
+"""
+
+import json
+import logging
+import sys
+import time
+
+# Attributes every LogRecord has; anything else came in through extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def record_fields(record):
+    """Standard fields plus the extras of a log record, in output order"""
+    fields = {
+        'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+        'level': record.levelname.lower(),
+        'logger': record.name,
+        'msg': record.getMessage(),
+    }
+    for key, value in vars(record).items():
+        if key not in _RECORD_ATTRS and not key.startswith('_'):
+            fields[key] = value
+    return fields
+
+
+class LogfmtFormatter(logging.Formatter):
+    """key=value pairs, quoting values that need it"""
+
+    @staticmethod
+    def _value(value):
+        if isinstance(value, float):
+            value = round(value, 6)
+        text = json.dumps(value, default=str) if isinstance(value, (dict, list)) else str(value)
+        if not text or any(c in text for c in ' ="\\\n'):
+            text = '"' + text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        return text
+
+    def format(self, record):
+        fields = record_fields(record)
+        if record.exc_info:
+            fields['exc'] = self.formatException(record.exc_info)
+        return ' '.join(f"{key}={self._value(value)}" for key, value in fields.items())
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        fields = record_fields(record)
+        if record.exc_info:
+            fields['exc'] = self.formatException(record.exc_info)
+        return json.dumps(fields, default=str, ensure_ascii=False)
+
+
+def configure(level='INFO', fmt='logfmt', stream=None):
+    """Send all logging to one stream handler with the chosen format"""
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JSONFormatter() if fmt == 'json' else LogfmtFormatter())
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper() if isinstance(level, str) else level)
@@ -5,23 +5,88 @@ Run: python app.py
 Access: http://localhost:5000
 """
 
-from flask import Flask, render_template_string, request, jsonify, send_file, make_response
-import pandas as pd
-import re
+from flask import Flask, Response, render_template_string, request, jsonify
 import os
-import zipfile
-import socket
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import io
+import csv
+import zlib
+import json
+import time
+import uuid
+import queue
+import shutil
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from werkzeug.utils import secure_filename
-from io import StringIO
+from ingest import FORMATS, SAMPLE_SIZE, extract_emails, iter_email_chunks, needs_file, process_zip
+from jobs import JobManager
+from dedup import StreamingDedup, deduplicate
+from result_store import ResultStore
+from checkpoint import JobCheckpoint, pending
+from shared_state import SharedJobManager, SharedResultStore, StateDB
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from upload_stream import MultipartUpload, Spool
+import log_config
+import pipeline
+from pipeline import (STAGE_SECONDS, STATUS_KEYS, check_email, dns_concurrency, iter_validation_batches,
+                      report_progress, time_left, validate_stream, warm_start)
+from results import RESULT_FIELDS, STATUS_UNCHECKED, STATUS_VALID, read_batches, revise_occurrences
 
 app = Flask(__name__)
-app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB
+# Uploads are spooled to disk as they arrive, so the cap bounds disk and upload time rather than memory
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 512)) * 1024 * 1024
+app.config['UPLOAD_CHUNK_ROWS'] = 10000  # rows parsed per chunk handed to validation
 app.config['UPLOAD_FOLDER'] = 'uploads'
+# DNS, cache and verdict store settings live in pipeline.config (same environment variables)
+app.config['JOB_DEADLINE'] = float(os.environ.get('JOB_DEADLINE', 0))  # seconds per job, 0 = none; then "Unchecked"
+app.config['MAX_ZIP_MEMBERS'] = 1000
+app.config['MAX_ZIP_UNCOMPRESSED'] = 2 * 1024 * 1024 * 1024  # 2GB
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 4))
+app.config['JOB_CHECKPOINT_SECONDS'] = float(os.environ.get('JOB_CHECKPOINT_SECONDS', 30))  # 0 = jobs don't survive restarts
+app.config['DEDUP_FOLD_ALIASES'] = False  # fold Gmail dots / +tags into one address
+app.config['RESULT_SPILL_BYTES'] = 8 * 1024 * 1024  # results above this go to disk
+app.config['API_STREAM_WINDOW'] = int(os.environ.get('API_STREAM_WINDOW', 1000))  # unfinished checks per stream
+app.config['RESULT_MAX_BYTES'] = 1024 * 1024 * 1024  # total budget for finished results
+app.config['RESULT_MAX_AGE'] = 6 * 3600  # seconds a finished job stays downloadable
+app.config['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'INFO')
+app.config['LOG_FORMAT'] = os.environ.get('LOG_FORMAT', 'logfmt')  # 'logfmt' or 'json'
+app.config['SHARED_STATE_DB'] = os.environ.get('SHARED_STATE_DB', '')  # set when running several worker processes
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-# Store results in memory to avoid file system issues
-validation_results_data = None
+log_config.configure(app.config['LOG_LEVEL'], app.config['LOG_FORMAT'])
+log = logging.getLogger('email_validator')
+
+if app.config['SHARED_STATE_DB']:
+    # Several worker processes: job progress and finished results are visible to all of them
+    state_db = StateDB(app.config['SHARED_STATE_DB'])
+    result_store = SharedResultStore(state_db, os.path.join(app.config['UPLOAD_FOLDER'], 'results'),
+                                     max_bytes=app.config['RESULT_MAX_BYTES'],
+                                     max_age=app.config['RESULT_MAX_AGE'])
+    jobs = SharedJobManager(state_db, max_workers=app.config['JOB_WORKERS'])
+else:
+    # Per-job results: in memory for small jobs, spilled to disk for large ones
+    result_store = ResultStore(os.path.join(app.config['UPLOAD_FOLDER'], 'results'),
+                               spill_threshold=app.config['RESULT_SPILL_BYTES'],
+                               max_bytes=app.config['RESULT_MAX_BYTES'],
+                               max_age=app.config['RESULT_MAX_AGE'])
+    
+    # Background validation jobs, addressable by job ID
+    jobs = JobManager(max_workers=app.config['JOB_WORKERS'])
+
+# Upload, results so far and progress marker of each unfinished job, for resuming after a restart
+CHECKPOINT_DIR = os.path.join(app.config['UPLOAD_FOLDER'], 'jobs')
+
+# Per-address checks for the JSON API; threads block on DNS, so size it like the socket backend
+api_pool = ThreadPoolExecutor(max_workers=pipeline.config['DNS_MAX_THREADS'], thread_name_prefix='api')
+
+# Web-side metrics, served at /metrics next to the pipeline's own
+JOB_SECONDS = pipeline.metrics.histogram('email_validator_job_seconds', 'Wall time of finished validation jobs',
+                                         ['outcome'])
+pipeline.metrics.gauge('email_validator_jobs', 'Known validation jobs by status; status="queued" is the queue depth',
+                       ['status'], collect=lambda: {(status, ): count for status, count in jobs.by_status().items()})
+pipeline.metrics.gauge('email_validator_result_store_bytes', 'Bytes held by stored job results',
+                       collect=lambda: result_store.stats()['bytes'])
 
 # HTML Template
 HTML_TEMPLATE = """
@@ -210,6 +275,19 @@ HTML_TEMPLATE = """
         .download-btn { display: none; }
         .download-btn.show { display: block; }
         
+        .download-type {
+            width: 100%;
+            padding: 12px;
+            border: 2px solid #d1fae5;
+            border-radius: 10px;
+            font-size: 14px;
+            color: #059669;
+            margin-bottom: 10px;
+            display: none;
+        }
+        
+        .download-type.show { display: block; }
+        
         .status-message {
             text-align: center;
             padding: 15px;
@@ -265,10 +343,10 @@ HTML_TEMPLATE = """
         <div class="upload-area" id="uploadArea" onclick="document.getElementById('fileInput').click()">
             <div class="upload-icon">📁</div>
             <div class="upload-text">Click to upload or drag & drop</div>
-            <div class="upload-subtext">CSV or ZIP files supported (Max 50MB)</div>
+            <div class="upload-subtext">CSV, Parquet, Arrow, XLSX, NDJSON, text (or .gz of them) and ZIP files supported (Max {{ max_upload_mb }}MB)</div>
         </div>
         
-        <input type="file" id="fileInput" accept=".csv,.zip" onchange="handleFileSelect(event)">
+        <input type="file" id="fileInput" accept="{{ accept }}" onchange="handleFileSelect(event)">
         
         <div class="file-info" id="fileInfo">
             <strong>Selected file:</strong> <span class="file-name" id="fileName"></span>
@@ -303,8 +381,14 @@ HTML_TEMPLATE = """
             </div>
         </div>
         
+        <select class="download-type" id="downloadType">
+            <option value="valid">Valid emails only</option>
+            <option value="invalid">Invalid emails with reasons</option>
+            <option value="all">All results with every check</option>
+        </select>
+        
         <button class="btn btn-primary download-btn" id="downloadBtn" onclick="downloadResults()">
-            💾 Download Valid Emails CSV
+            💾 Download Results CSV
         </button>
         
         <div class="status-message" id="statusMessage"></div>
@@ -345,8 +429,9 @@ HTML_TEMPLATE = """
         function handleFile(file) {
             const fileName = file.name.toLowerCase();
             
-            if (!fileName.endsWith('.csv') && !fileName.endsWith('.zip')) {
-                showStatus('Please select a CSV or ZIP file', 'error');
+            const extensions = '{{ accept }}'.split(',');
+            if (!extensions.some(ext => fileName.endsWith(ext))) {
+                showStatus('Please select a CSV, Parquet, Arrow, XLSX, NDJSON, text or ZIP file', 'error');
                 return;
             }
             
@@ -371,9 +456,12 @@ HTML_TEMPLATE = """
             document.getElementById('progressContainer').classList.add('show');
             document.getElementById('statsContainer').classList.remove('show');
             document.getElementById('downloadBtn').classList.remove('show');
+            document.getElementById('downloadType').classList.remove('show');
             
-            document.getElementById('progressFill').style.width = '10%';
-            document.getElementById('progressFill').textContent = '10%';
+            document.getElementById('progressFill').style.width = '0%';
+            document.getElementById('progressFill').textContent = '0%';
+            document.getElementById('progressText').textContent = 'Uploading...';
+            document.getElementById('speedInfo').textContent = '';
             
             startTime = Date.now();
             showStatus('⚡ Processing with multi-threading...', 'processing');
@@ -390,25 +478,67 @@ HTML_TEMPLATE = """
                 
                 const data = await response.json();
                 
-                document.getElementById('spinner').classList.remove('show');
-                
                 if (data.success) {
-                    validationResults = data;
-                    displayResults(data);
+                    trackProgress(data.job_id);
                 } else {
-                    showStatus('Error: ' + (data.error || 'Unknown error'), 'error');
-                    document.getElementById('startBtn').disabled = false;
-                    document.getElementById('progressContainer').classList.remove('show');
+                    validationFailed(data.error);
                 }
             } catch (error) {
-                document.getElementById('spinner').classList.remove('show');
-                showStatus('Error: ' + error.message, 'error');
-                document.getElementById('startBtn').disabled = false;
-                document.getElementById('progressContainer').classList.remove('show');
+                validationFailed(error.message);
                 console.error('Validation error:', error);
             }
         }
         
+        function trackProgress(jobId) {
+            const source = new EventSource('/progress/' + jobId);
+            
+            source.onmessage = (event) => {
+                const job = JSON.parse(event.data);
+                updateProgress(job);
+                
+                if (job.status === 'done') {
+                    source.close();
+                    document.getElementById('spinner').classList.remove('show');
+                    validationResults = job;
+                    displayResults(job);
+                } else if (job.status === 'failed') {
+                    source.close();
+                    validationFailed(job.error);
+                }
+            };
+            
+            source.onerror = () => {
+                if (source.readyState === EventSource.CLOSED) {
+                    validationFailed('Lost connection to server');
+                }
+            };
+        }
+        
+        function updateProgress(job) {
+            const percent = job.total ? Math.floor(job.processed * 100 / job.total) : 0;
+            const labels = { queued: 'Queued...', parsing: 'Reading file...', validating: 'Validating...' };
+            
+            document.getElementById('progressFill').style.width = percent + '%';
+            document.getElementById('progressFill').textContent = percent + '%';
+            document.getElementById('progressText').textContent =
+                (labels[job.status] || 'Processing...') + (job.total ? ` ${job.processed} / ${job.total}` : '');
+            document.getElementById('speedInfo').textContent = job.processed ? `⚡ ${job.rate} emails/sec` : '';
+            
+            document.getElementById('validCount').textContent = job.valid;
+            document.getElementById('invalidCount').textContent = job.invalid;
+            document.getElementById('totalCount').textContent = job.total;
+            if (job.total) {
+                document.getElementById('statsContainer').classList.add('show');
+            }
+        }
+        
+        function validationFailed(message) {
+            document.getElementById('spinner').classList.remove('show');
+            showStatus('Error: ' + (message || 'Unknown error'), 'error');
+            document.getElementById('startBtn').disabled = false;
+            document.getElementById('progressContainer').classList.remove('show');
+        }
+        
         function displayResults(data) {
             const endTime = Date.now();
             const duration = ((endTime - startTime) / 1000).toFixed(2);
@@ -425,12 +555,15 @@ HTML_TEMPLATE = """
             document.getElementById('statsContainer').classList.add('show');
             
             document.getElementById('downloadBtn').classList.add('show');
+            document.getElementById('downloadType').classList.add('show');
             
             showStatus(`✅ Complete in ${duration}s! Valid: ${data.valid} | Invalid: ${data.invalid}`, 'success');
             
             document.getElementById('startBtn').disabled = false;
         }
         
+        const DOWNLOAD_NAMES = { valid: 'valid_emails.csv', invalid: 'invalid_emails.csv', all: 'all_results.csv' };
+        
         function downloadResults() {
             if (!validationResults) {
                 showStatus('No results to download', 'error');
@@ -442,8 +575,9 @@ HTML_TEMPLATE = """
                 
                 // Create download link
                 const link = document.createElement('a');
-                link.href = '/download';
-                link.download = 'valid_emails.csv';
+                const type = document.getElementById('downloadType').value;
+                link.href = '/download/' + validationResults.job_id + '?type=' + type;
+                link.download = DOWNLOAD_NAMES[type];
                 link.style.display = 'none';
                 
                 document.body.appendChild(link);
@@ -470,271 +604,530 @@ HTML_TEMPLATE = """
 </html>
 """
 
-# Common email domains for quick validation
-COMMON_DOMAINS = {
-    'gmail.com', 'yahoo.com', 'hotmail.com', 'outlook.com', 'aol.com',
-    'icloud.com', 'mail.com', 'zoho.com', 'protonmail.com', 'yandex.com',
-    'live.com', 'msn.com', 'inbox.com', 'gmx.com', 'fastmail.com'
-}
-
-def validate_email_syntax(email):
-    """Strict email syntax validation"""
-    if not email or len(email) > 254:
-        return False
-    
-    pattern = r'^[a-zA-Z0-9][a-zA-Z0-9._%+-]*@[a-zA-Z0-9][a-zA-Z0-9.-]*\.[a-zA-Z]{2,}$'
-    
-    if not re.match(pattern, email):
-        return False
-    
-    if '..' in email:
-        return False
-    
-    local, domain = email.rsplit('@', 1)
-    
-    if len(local) > 64 or len(domain) > 253:
-        return False
-    
-    if local.startswith('.') or local.endswith('.'):
-        return False
-    
-    return True
+@app.route('/')
+def index():
+    return render_template_string(HTML_TEMPLATE, max_upload_mb=app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024),
+                                  accept=','.join(list(FORMATS) + ['.gz']))
 
-def check_domain_exists(domain):
-    """Fast domain existence check"""
-    if domain.lower() in COMMON_DOMAINS:
-        return True
-    
-    try:
-        socket.setdefaulttimeout(2)
-        socket.gethostbyname(domain)
-        return True
-    except:
-        try:
-            socket.getaddrinfo(domain, None)
-            return True
-        except:
-            return False
-
-def check_email(email):
-    """Accurate email validation with domain checking"""
-    result = {
-        "Email": email,
-        "Syntax_Valid": False,
-        "Domain_Exists": False,
-        "MX_Record": False,
-        "Final_Status": "❌ Invalid"
-    }
-    
-    try:
-        if not validate_email_syntax(email):
-            result["Final_Status"] = "❌ Invalid Syntax"
-            return result
-        
-        result["Syntax_Valid"] = True
-        domain = email.split('@')[-1]
-        
-        if check_domain_exists(domain):
-            result["Domain_Exists"] = True
-            result["MX_Record"] = True
-            result["Final_Status"] = "✅ Valid"
-        else:
-            result["Final_Status"] = "⚠️ Invalid Domain"
-            
-    except:
-        result["Final_Status"] = "❌ Error"
-    
-    return result
+def run_validation_job(job, filepath, filename, fold_aliases=False, deadline=None, checkpoint=None, incremental=False):
+    """Background worker: extract, validate and store results for one upload
 
-def extract_emails_from_csv(csv_path):
-    """Extract emails from CSV"""
+    deadline is a time.monotonic() value; addresses not resolved by then are
+    written as Unchecked so the job still ends on time. With a checkpoint,
+    results go to its append-only file and are marked durable every
+    JOB_CHECKPOINT_SECONDS; a resumed job skips the batches already saved.
+    incremental reuses address outcomes checked within ADDRESS_MAX_AGE.
+    """
+    started = time.perf_counter()
+    outcome = 'failed'
     try:
-        for encoding in ['utf-8', 'latin-1', 'iso-8859-1']:
-            try:
-                df = pd.read_csv(csv_path, encoding=encoding, on_bad_lines='skip')
-                break
-            except:
-                continue
-        else:
-            return []
-        
-        email_col = None
-        for col in df.columns:
-            col_lower = str(col).lower()
-            if 'email' in col_lower or 'mail' in col_lower or 'e-mail' in col_lower:
-                email_col = col
-                break
+        log.info("Job started", extra={'job': job.id, 'upload': filename})
+        job.set_status('parsing')
         
-        if email_col is None:
-            email_col = df.columns[0]
+        # Extract emails
+        with STAGE_SECONDS.time(stage='parse'):
+            if filename.lower().endswith('.zip'):
+                emails = process_zip(filepath,
+                                     max_members=app.config['MAX_ZIP_MEMBERS'],
+                                     max_uncompressed=app.config['MAX_ZIP_UNCOMPRESSED'])
+            else:
+                emails = extract_emails(filepath)
         
-        emails = df[email_col].astype(str).tolist()
+        if not emails:
+            raise ValueError('No valid emails found')
         
-        cleaned = []
-        for email in emails:
-            email = str(email).strip().lower()
-            if email and email != 'nan' and '@' in email and '.' in email:
-                cleaned.append(email)
+        # Collapse duplicates (and provider aliases, if asked) so each address is checked once
+        with STAGE_SECONDS.time(stage='dedup'):
+            unique = deduplicate(emails, fold_aliases=fold_aliases,
+                                 spill_dir=os.path.join(app.config['UPLOAD_FOLDER'], 'dedup'))
+        log.info("Parsed upload", extra={'job': job.id, 'emails': unique.rows,
+                                         'unique': len(unique.unique), 'duplicates': unique.duplicates})
+        emails = None  # release the raw per-row list
         
-        return cleaned
-    except Exception as e:
-        print(f"Error reading CSV: {e}")
-        return []
+        # Validate
+        job.set_status('validating', total=unique.rows, unique=len(unique.unique))
+        
+        # Append each batch to the result file in its compact form; labels are rendered at download
+        skip = 0
+        if checkpoint is not None:
+            # Batches saved before a restart are kept as they are; only their counts are reloaded
+            skip = checkpoint.batches
+            done = checkpoint.completed_counts().tolist()
+            job.advance(done[STATUS_VALID], sum(done) - done[STATUS_VALID], done[STATUS_UNCHECKED])
+            if skip:
+                log.info("Job resumed", extra={'job': job.id, 'batches_done': skip, 'processed': job.processed})
+            sink = checkpoint.open_results()
+        else:
+            sink = result_store.create(job.id)
+        write_seconds = 0.0
+        saved_at = time.monotonic()
+        try:
+            batches = iter_validation_batches(unique.unique, job, counts=unique.counts, deadline=deadline,
+                                              skip_batches=skip, incremental=incremental)
+            for number, batch in enumerate(batches, skip + 1):
+                batch_started = time.perf_counter()
+                sink.write(batch.encode())
+                if checkpoint is not None and time.monotonic() - saved_at >= app.config['JOB_CHECKPOINT_SECONDS']:
+                    checkpoint.save(sink, number, deadline_left=time_left(deadline))
+                    saved_at = time.monotonic()
+                write_seconds += time.perf_counter() - batch_started
+        finally:
+            sink.close()
+        STAGE_SECONDS.observe(write_seconds, stage='write')
+        blob = sink if checkpoint is None else result_store.adopt(job.id, checkpoint.results_path)
+        log_job_finished(job, started, blob)
+        outcome = 'done'
+    finally:
+        JOB_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
+        # Cleanup
+        if checkpoint is not None:
+            checkpoint.remove()
+        else:
+            try:
+                os.remove(filepath)
+            except:
+                pass
 
-def process_zip(zip_path):
-    """Extract all CSVs from ZIP"""
-    all_emails = []
-    temp_dir = None
-    
+def run_streaming_job(job, spool, filename, fold_aliases=False, deadline=None, checkpoint=None, incremental=False):
+    """Background worker for an upload still in flight: parses and validates its spool as it grows
+
+    Result batches are written as they come. A duplicate arriving later
+    raises the Occurrences of an address already written, so once the
+    upload is exhausted those columns are rewritten in place. With a
+    checkpoint, results are saved as in run_validation_job once the whole
+    upload is in (before that there is no input to resume from); a resumed
+    job replays the input and validates only addresses without a result.
+    """
+    started = time.perf_counter()
+    outcome = 'failed'
     try:
-        temp_dir = os.path.join(app.config['UPLOAD_FOLDER'], 'temp_extracted')
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(temp_dir)
-        
-        for root, dirs, files in os.walk(temp_dir):
-            for file in files:
-                if file.lower().endswith('.csv'):
-                    csv_path = os.path.join(root, file)
-                    emails = extract_emails_from_csv(csv_path)
-                    all_emails.extend(emails)
-    except Exception as e:
-        print(f"Error processing ZIP: {e}")
+        log.info("Job started", extra={'job': job.id, 'upload': filename, 'streaming': True})
+        job.set_status('parsing')
+        tally = StreamingDedup(fold_aliases)
+        skip = 0
+        settled = None
+        if checkpoint is not None:
+            # Saved addresses keep their results; the replay only restores their counts
+            skip = checkpoint.batches
+            settled = {tally.key(email): code for batch in checkpoint.saved_batches()
+                       for email, code in zip(batch.emails, batch.status.tolist())}
+            if skip:
+                log.info("Job resumed", extra={'job': job.id, 'batches_done': skip, 'addresses_done': len(settled)})
+            sink = checkpoint.open_results()
+        else:
+            sink = result_store.create(job.id)
+        chunks = iter_email_chunks(io.BufferedReader(spool.reader(), SAMPLE_SIZE), filename,
+                                   app.config['UPLOAD_CHUNK_ROWS'])
+        write_seconds = 0.0
+        saved_at = time.monotonic()
+        try:
+            batches = validate_stream(chunks, tally, job, deadline=deadline, incremental=incremental, settled=settled)
+            for number, batch in enumerate(batches, skip + 1):
+                batch_started = time.perf_counter()
+                sink.write(batch.encode())
+                if checkpoint is not None and spool.done and \
+                        time.monotonic() - saved_at >= app.config['JOB_CHECKPOINT_SECONDS']:
+                    checkpoint.save(sink, number, deadline_left=time_left(deadline))
+                    saved_at = time.monotonic()
+                write_seconds += time.perf_counter() - batch_started
+            if not job.total:
+                raise ValueError('No valid emails found')
+            log.info("Parsed upload", extra={'job': job.id, 'emails': job.total, 'unique': job.unique,
+                                             'duplicates': job.total - job.unique})
+            if tally.revised and checkpoint is None:
+                revise_started = time.perf_counter()
+                sink.rewrite(lambda stream: revise_occurrences(stream, tally.occurrences))
+                write_seconds += time.perf_counter() - revise_started
+        finally:
+            sink.close()
+        if checkpoint is not None:
+            if tally.revised:
+                revise_started = time.perf_counter()
+                with open(checkpoint.results_path, 'r+b') as results:
+                    revise_occurrences(results, tally.occurrences)
+                write_seconds += time.perf_counter() - revise_started
+            blob = result_store.adopt(job.id, checkpoint.results_path)
+        else:
+            blob = sink
+        STAGE_SECONDS.observe(write_seconds, stage='write')
+        log_job_finished(job, started, blob)
+        outcome = 'done'
     finally:
-        if temp_dir and os.path.exists(temp_dir):
-            import shutil
+        JOB_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
+        if checkpoint is not None:
+            checkpoint.remove()
+        else:
+            if outcome != 'done':
+                result_store.discard(job.id)  # partial results are never served
             try:
-                shutil.rmtree(temp_dir)
-            except:
+                os.remove(spool.path)
+            except OSError:
                 pass
-    
-    return all_emails
 
-@app.route('/')
-def index():
-    return render_template_string(HTML_TEMPLATE)
+def log_job_finished(job, started, blob):
+    cache = pipeline.domain_cache.stats()
+    limit = dns_concurrency().stats()
+    breaker = pipeline.domain_breaker.stats()
+    log.info("Job finished", extra={
+        'job': job.id,
+        'valid': job.valid,
+        'invalid': job.invalid,
+        'unchecked': job.unchecked,
+        'seconds': round(time.perf_counter() - started, 3),
+        'cache_hits': cache['hits'],
+        'cache_misses': cache['misses'],
+        'dns_limit': limit['limit'],
+        'dns_latency_ms': limit['latency_ms'],
+        'dns_drop_rate': limit['drop_rate'],
+        'breaker_open': breaker['open'],
+        'result_bytes': blob.size,
+        'result_on_disk': blob.on_disk,
+    })
+
+def resume_jobs():
+    """Requeue checkpointed jobs that a previous process never finished, under their old IDs"""
+    for checkpoint in pending(CHECKPOINT_DIR):
+        if not checkpoint.claim():
+            continue  # still running in another process
+        left = checkpoint.state.get('deadline_left')
+        deadline = time.monotonic() + left if left is not None else None
+        filename = checkpoint.state['filename']
+        if needs_file(filename):
+            worker, source = run_validation_job, checkpoint.input_path
+        else:
+            # Streamed when uploaded: its saved batches follow the stream's order, so it resumes the same way
+            worker, source = run_streaming_job, Spool(checkpoint.input_path, complete=True)
+        jobs.submit(worker, source, filename, checkpoint.state.get('fold_aliases', False),
+                    deadline, checkpoint, checkpoint.state.get('incremental', False),
+                    filename=filename, job_id=checkpoint.job_id)
+        log.info("Job queued for resume", extra={'job': checkpoint.job_id, 'upload': filename,
+                                                 'batches_done': checkpoint.batches})
+
+def evict_finished_jobs():
+    """Forget old jobs and keep stored results within the age and byte budget"""
+    for job_id in jobs.prune(app.config['RESULT_MAX_AGE']):
+        result_store.discard(job_id)
+    result_store.evict()
 
 @app.route('/validate', methods=['POST'])
 def validate():
-    global validation_results_data
-    
+    """Start a job for an uploaded file (see ingest.FORMATS)
+
+    The body is read as it arrives rather than buffered by the form parser:
+    CSV, NDJSON and text rows (gzipped or not) are parsed and validated
+    while the upload is still in flight.
+    Options come from the query string or from form fields sent before the file.
+    """
     try:
-        if 'file' not in request.files:
+        boundary = request.mimetype_params.get('boundary')
+        if request.mimetype != 'multipart/form-data' or not boundary:
             return jsonify({'success': False, 'error': 'No file uploaded'})
         
-        file = request.files['file']
-        
-        if file.filename == '':
+        upload = MultipartUpload(request.stream, boundary)
+        if upload.start() is None:
+            return jsonify({'success': False, 'error': 'No file uploaded'})
+        if upload.filename == '':
             return jsonify({'success': False, 'error': 'No file selected'})
         
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
-        print(f"\n{'='*60}")
-        print(f"Processing: {filename}")
-        
-        # Extract emails
-        if filename.lower().endswith('.zip'):
-            emails = process_zip(filepath)
+        filename = secure_filename(upload.filename)
+        option = lambda name, default='': request.args.get(name, upload.fields.get(name, default))
+        
+        evict_finished_jobs()
+        fold_aliases = option('fold_aliases', str(app.config['DEDUP_FOLD_ALIASES'])).lower() in ('1', 'true', 'on')
+        incremental = option('incremental').lower() in ('1', 'true', 'on')
+        # The time budget starts at upload, so queueing and parsing count against it too
+        budget = float(option('deadline', app.config['JOB_DEADLINE']) or 0)
+        deadline = time.monotonic() + budget if budget > 0 else None
+        job_id = uuid.uuid4().hex
+        state = {'fold_aliases': fold_aliases, 'incremental': incremental,
+                 'deadline_left': budget if deadline is not None else None}
+        
+        if needs_file(filename):
+            # ZIP, Parquet, Arrow and XLSX keep their index at the end: the file has to land on disk first
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{job_id}_{filename}")
+            with open(filepath, 'wb') as f:
+                shutil.copyfileobj(upload, f, SAMPLE_SIZE)
+            upload.finish()
+            checkpoint = None
+            if app.config['JOB_CHECKPOINT_SECONDS'] > 0:
+                checkpoint = JobCheckpoint.create(CHECKPOINT_DIR, job_id, filepath, filename, **state)
+                filepath = checkpoint.input_path
+            job = jobs.submit(run_validation_job, filepath, filename, fold_aliases, deadline, checkpoint, incremental,
+                              filename=filename, job_id=job_id)
         else:
-            emails = extract_emails_from_csv(filepath)
-        
-        print(f"Found: {len(emails)} emails")
-        
-        if not emails:
-            os.remove(filepath)
-            return jsonify({'success': False, 'error': 'No valid emails found'})
-        
-        # Validate
-        results = []
-        valid_count = 0
-        invalid_count = 0
-        
-        print("Validating...")
-        
-        with ThreadPoolExecutor(max_workers=30) as executor:
-            future_to_email = {executor.submit(check_email, email): email for email in emails}
-            
-            for future in as_completed(future_to_email):
-                result = future.result()
-                results.append(result)
-                
-                if result["Final_Status"] == "✅ Valid":
-                    valid_count += 1
-                else:
-                    invalid_count += 1
-        
-        print(f"Done! Valid: {valid_count}, Invalid: {invalid_count}")
-        
-        # Store only valid emails in memory for download
-        valid_emails = [result["Email"] for result in results if result["Final_Status"] == "✅ Valid"]
-        df_valid = pd.DataFrame(valid_emails, columns=["Email"])
-        validation_results_data = df_valid.to_csv(index=False)
-        
-        print(f"Valid emails stored in memory ({len(valid_emails)} valid emails)")
-        print(f"{'='*60}\n")
-        
-        # Cleanup
-        try:
-            os.remove(filepath)
-        except:
-            pass
-        
-        return jsonify({
-            'success': True,
-            'valid': valid_count,
-            'invalid': invalid_count,
-            'total': len(results)
-        })
+            job = stream_upload(upload, job_id, filename, deadline, state)
+        return jsonify({'success': True, 'job_id': job.id})
         
     except Exception as e:
-        print(f"Error: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Upload failed")
         return jsonify({'success': False, 'error': str(e)})
 
-@app.route('/download')
-def download():
-    global validation_results_data
+def stream_upload(upload, job_id, filename, deadline, state):
+    """Spool a streamable upload to disk while a job parses and validates it from the spool
+
+    This thread only copies bytes, so validation never holds up the client:
+    /validate answers as soon as the last byte is in, and the job, which
+    follows the spool as it grows, has been producing results since the
+    first chunk. With checkpoints on, the spool is the checkpoint's input
+    and the job becomes resumable once the upload is complete.
+    """
+    checkpoint = None
+    if app.config['JOB_CHECKPOINT_SECONDS'] > 0:
+        checkpoint = JobCheckpoint.begin(CHECKPOINT_DIR, job_id, filename, **state)
+        path = checkpoint.input_path
+    else:
+        path = os.path.join(app.config['UPLOAD_FOLDER'], f"{job_id}_{filename}")
+    spool = Spool(path)
+    job = jobs.submit(run_streaming_job, spool, filename, state['fold_aliases'], deadline, checkpoint,
+                      state['incremental'], filename=filename, job_id=job_id)
+    try:
+        with STAGE_SECONDS.time(stage='upload'):
+            while True:
+                data = upload.read(SAMPLE_SIZE)
+                if not data:
+                    break
+                spool.write(data)
+            upload.finish()
+        if checkpoint is not None:
+            # Durable and complete before the manifest says so; the job can't finish before close()
+            spool.sync()
+            checkpoint.commit()
+    except BaseException as e:
+        spool.close(error=e)
+        raise
+    spool.close()
+    log.info("Upload received", extra={'job': job_id, 'upload': filename, 'bytes': spool.size})
+    return job
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Job snapshot; pass ?since=<version> to long-poll for the next change"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    
+    since = request.args.get('since', type=int)
+    if since is not None and not job.finished:
+        job.wait(since, timeout=25)
+    return jsonify(job.snapshot())
+
+@app.route('/progress/<job_id>')
+def progress(job_id):
+    """Server-Sent Events stream of job progress until it finishes"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
     
-    print("\n" + "="*60)
-    print("Download requested")
+    def stream():
+        while True:
+            snapshot = job.snapshot()
+            yield f"data: {json.dumps(snapshot)}\n\n"
+            if snapshot['status'] in ('done', 'failed'):
+                return
+            job.wait(snapshot['version'], timeout=15)
+            # Coalesce bursts of updates into a few events per second
+            time.sleep(0.25)
+    
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+DOWNLOAD_NAMES = {'valid': 'valid_emails.csv', 'invalid': 'invalid_emails.csv', 'all': 'all_results.csv'}
+
+def iter_result_csv(blob, kind, email_only, chunk_size=64 * 1024):
+    """Yield CSV text for the selected rows of a stored result, a chunk at a time"""
+    with blob.open() as stored:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerow(RESULT_FIELDS[:1] if email_only else RESULT_FIELDS)
+        
+        for batch in read_batches(stored):
+            # Rows are filtered on the status column; labels are only produced for rows that go out
+            batch = batch.select(kind)
+            rows = ((email,) for email in batch.emails) if email_only else batch.rows()
+            for row in rows:
+                writer.writerow(row)
+                if buffer.tell() >= chunk_size:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+        
+        yield buffer.getvalue()
+
+def gzip_chunks(chunks):
+    """Gzip a stream of text chunks incrementally"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+@app.route('/download')
+@app.route('/download/<job_id>')
+def download(job_id=None):
+    """Stream a job's results: ?type=valid|invalid|all, ?fields=email|all"""
+    job_id = job_id or request.args.get('job_id')
+    kind = request.args.get('type', 'valid')
+    # Valid-only downloads stay a clean email list unless every field is asked for
+    fields = request.args.get('fields', 'email' if kind == 'valid' else 'all')
     
     try:
-        if not validation_results_data:
-            print("ERROR: No results available")
-            return "No results available. Please run validation first.", 404
-        
-        print(f"Sending CSV data with {len(validation_results_data.splitlines())-1} valid emails")
-        
-        # Create response with CSV data containing only valid emails
-        response = make_response(validation_results_data)
-        response.headers['Content-Type'] = 'text/csv'
-        response.headers['Content-Disposition'] = 'attachment; filename=valid_emails.csv'
+        if not job_id:
+            return "Missing job ID. Please run validation first.", 400
+        if kind not in DOWNLOAD_NAMES:
+            return "Unknown download type. Use valid, invalid or all.", 400
+        
+        blob = result_store.get(job_id)
+        if blob is None:
+            log.warning("Download of unknown or unfinished job", extra={'job': job_id})
+            return "No results available for this job. Please run validation first.", 404
+        
+        chunks = iter_result_csv(blob, kind, email_only=(fields == 'email'))
+        headers = {
+            'Content-Disposition': f'attachment; filename={DOWNLOAD_NAMES[kind]}',
+            'Vary': 'Accept-Encoding',
+        }
+        if 'gzip' in request.accept_encodings:
+            chunks = gzip_chunks(chunks)
+            headers['Content-Encoding'] = 'gzip'
         
-        print("Download successful!")
-        print("="*60 + "\n")
+        # No Content-Length: the body goes out chunked as rows are read
+        log.info("Download", extra={'job': job_id, 'type': kind, 'fields': fields, 'stored_bytes': blob.size,
+                                    'encoding': headers.get('Content-Encoding', 'identity')})
         
-        return response
+        return Response(chunks, mimetype='text/csv', headers=headers)
         
     except Exception as e:
-        print(f"ERROR: {e}")
-        import traceback
-        traceback.print_exc()
-        print("="*60 + "\n")
+        log.exception("Download failed", extra={'job': job_id})
         return f"Download failed: {str(e)}", 500
 
+def api_result(result, correlation_id=None):
+    """check_email() result as an API object, with a machine-readable status"""
+    payload = {} if correlation_id is None else {'id': correlation_id}
+    payload.update({
+        'email': result["Email"],
+        'status': STATUS_KEYS.get(result["Final_Status"], 'error'),
+        'syntax_valid': result["Syntax_Valid"],
+        'domain_exists': result["Domain_Exists"],
+        'mx_record': result["MX_Record"],
+        'type': result["Type"] or None,
+        'label': result["Final_Status"],
+    })
+    return payload
+
+def parse_check_line(line, seq):
+    """(correlation ID, email) from an NDJSON object, JSON string or bare address; the ID defaults to the line number"""
+    line = line.strip()
+    if line.startswith(b'{'):
+        item = json.loads(line)
+        email = item.get('email')
+        if not isinstance(email, str):
+            raise ValueError("missing 'email'")
+        return item.get('id', seq), email.strip()
+    if line.startswith(b'"'):
+        # A JSON string, as the NDJSON file reader accepts too
+        return seq, json.loads(line).strip()
+    return seq, line.decode('utf-8', errors='replace')
+
+@app.route('/api/v1/check', methods=['GET', 'POST'])
+def check_one():
+    """Validate a single address: ?email=... or a JSON body {"email": ..., "id": ...}"""
+    body = request.get_json(silent=True)
+    if body is None:
+        body = {}
+    if not isinstance(body, dict):
+        return jsonify({'error': 'JSON body must be an object'}), 400
+    email = body.get('email') if body else request.values.get('email')
+    if not isinstance(email, str) or not email.strip():
+        return jsonify({'error': "missing 'email'"}), 400
+    
+    result = check_email(email.strip())
+    report_progress(None, [result])
+    return jsonify(api_result(result, body.get('id')))
+
+@app.route('/api/v1/check/stream', methods=['POST'])
+def check_stream():
+    """NDJSON batch API: one input line per address, one output line per result as soon as it is ready
+
+    Input lines are {"id": ..., "email": ...} objects, JSON strings or bare
+    addresses; output is in completion order, so clients match results up
+    by id (the line number, from 1, when no id is given). Requests can be sent chunked and results
+    start flowing while the body is still arriving.
+    """
+    stream = request.stream
+    window_size = app.config['API_STREAM_WINDOW']
+    window = threading.BoundedSemaphore(window_size)
+    results = queue.Queue()
+    
+    def finished(future, correlation_id):
+        try:
+            result = future.result()
+            report_progress(None, [result])
+            line = api_result(result, correlation_id)
+        except Exception as e:
+            line = {'id': correlation_id, 'error': str(e)}
+        results.put(json.dumps(line, ensure_ascii=False) + '\n')
+        window.release()
+    
+    def read():
+        # Only unfinished checks are bounded, never unread output, so a client
+        # that sends everything before reading cannot deadlock the stream
+        try:
+            for seq, line in enumerate(stream, 1):
+                if not line.strip():
+                    continue
+                try:
+                    correlation_id, email = parse_check_line(line, seq)
+                except ValueError as e:
+                    results.put(json.dumps({'id': seq, 'error': f"bad input line: {e}"}) + '\n')
+                    continue
+                window.acquire()
+                future = api_pool.submit(check_email, email)
+                future.add_done_callback(lambda f, correlation_id=correlation_id: finished(f, correlation_id))
+        except Exception as e:
+            log.warning("Stream request aborted", extra={'error': str(e)})
+            results.put(json.dumps({'error': f"request aborted: {e}"}) + '\n')
+        finally:
+            for _ in range(window_size):
+                window.acquire()
+            results.put(None)
+    
+    threading.Thread(target=read, name='api-stream', daemon=True).start()
+    
+    def generate():
+        while True:
+            line = results.get()
+            lines = []
+            # Coalesce whatever else is ready into one write
+            while line is not None:
+                lines.append(line)
+                try:
+                    line = results.get_nowait()
+                except queue.Empty:
+                    break
+            if lines:
+                yield ''.join(lines)
+            if line is None:
+                return
+    
+    return Response(generate(), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(pipeline.metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+def startup():
+    """Once per serving process: warm the verdict caches and requeue unfinished jobs
+
+    Not run at import, since the ZIP reader's spawned worker processes
+    import this module too; servers call it (see gunicorn.conf.py).
+    """
+    warm_start()
+    resume_jobs()
+
 if __name__ == '__main__':
-    print("=" * 60)
-    print("⚡ Email Validator Pro - FIXED VERSION")
-    print("=" * 60)
-    print("✅ Download issues fixed (in-memory storage)")
-    print("✅ Only valid emails in download file")
-    print("✅ Clean CSV with just email addresses")
-    print("🚀 Multi-threaded processing")
-    print("🌐 Access: http://localhost:5000")
-    print("💡 Press Ctrl+C to stop")
-    print("=" * 60)
+    startup()
+    log.info("Email Validator Pro listening", extra={'url': 'http://localhost:5000', 'dns_backend': pipeline.config['DNS_BACKEND']})
     app.run(debug=False, host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file
@@ -0,0 +1,613 @@
+"""
+Validation pipeline
+Domain verdicts (memory cache, verdict store, resolver), check_email and
+the batched validation loop, shared by the web app and the command line
+"""
+
+import logging
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+
+import numpy as np
+
+from address_index import AddressIndex, address_hash
+from concurrency import AdaptiveLimit, CircuitBreaker, SingleFlight, ThreadGate
+from dedup import deduplicate
+from dns_resolver import AsyncResolver, ResolverThread, error_verdict, parse_address, timeout_verdict
+from domain_cache import DomainCache
+import domain_index
+from domain_index import TYPE_DISPOSABLE, TYPE_LABELS, classify
+from email_syntax import REASON_LABELS, iter_syntax_batches, validate_email_syntax
+from metrics import Registry
+from results import (CHECK_MASK, FLAG_SYNTAX, STATUS_DISPOSABLE, STATUS_ERROR, STATUS_INVALID_DOMAIN,
+                     STATUS_INVALID_SYNTAX, STATUS_LABELS, STATUS_NAMES, STATUS_NO_MAIL_SERVER, STATUS_UNCHECKED,
+                     STATUS_VALID, TYPE_SHIFT, ResultBatch, verdict_status)
+from verdict_store import VerdictStore
+
+log = logging.getLogger(__name__)
+
+# Settings come from the environment; change them at runtime with configure()
+config = {
+    'DNS_BACKEND': os.environ.get('DNS_BACKEND', 'async'),  # 'async' (UDP) or 'socket'
+    'DNS_RESOLVER': os.environ.get('DNS_RESOLVER'),  # host[:port][,host[:port]]; default /etc/resolv.conf
+    'DNS_MAX_CONCURRENCY': int(os.environ.get('DNS_MAX_CONCURRENCY', 2000)),  # async in-flight ceiling
+    'DNS_MAX_THREADS': int(os.environ.get('DNS_MAX_THREADS', 256)),  # socket backend ceiling
+    'DNS_TIMEOUT': float(os.environ.get('DNS_TIMEOUT', 2.0)),  # per query attempt (async backend)
+    'DNS_LOOKUP_TIMEOUT': float(os.environ.get('DNS_LOOKUP_TIMEOUT', 5.0)),  # per domain verdict
+    'DNS_BREAKER_THRESHOLD': int(os.environ.get('DNS_BREAKER_THRESHOLD', 3)),  # timeouts before failing fast
+    'DNS_BREAKER_COOLDOWN': float(os.environ.get('DNS_BREAKER_COOLDOWN', 60)),  # seconds before a retry probe
+    'VERDICT_DB': os.environ.get('VERDICT_DB', os.path.join('data', 'domain_verdicts.db')),  # '' disables
+    'VERDICT_PRELOAD': int(os.environ.get('VERDICT_PRELOAD', 10000)),
+    'ADDRESS_DB': os.environ.get('ADDRESS_DB', os.path.join('data', 'address_index.db')),  # '' disables
+    'ADDRESS_MAX_AGE': float(os.environ.get('ADDRESS_MAX_AGE', 7 * 86400)),  # seconds a verdict is reused
+    'DOMAIN_INDEX': os.environ.get('DOMAIN_INDEX', os.path.join('data', 'domain_index.bin')),  # built-ins if missing
+    'DROP_DISPOSABLE': os.environ.get('DROP_DISPOSABLE', '1').lower() in ('1', 'true', 'on'),  # skip their DNS
+}
+
+# Domain verdicts shared by every job in this process
+domain_cache = DomainCache(max_size=100000, positive_ttl=3600, negative_ttl=300)
+
+# Concurrent lookups of one domain share a single query
+domain_flights = SingleFlight()
+
+# Built from config by configure():
+verdict_store = None        # verdicts persisted across runs and restarts
+address_index = None        # per-address outcomes, for incremental re-validation
+domain_types = None         # memory-mapped disposable / free-mail domain index
+dns_resolver = None         # async UDP resolver, started on first use
+socket_concurrency = None   # adaptive in-flight limit of the socket backend
+socket_gate = None
+lookup_pool = None          # blocking getaddrinfo calls, so callers can stop waiting at their deadline
+domain_breaker = None       # domains that keep timing out fail fast until a probe gets through
+
+
+def configure(**settings):
+    """Override config keys and rebuild the state that depends on them"""
+    global verdict_store, address_index, domain_types, dns_resolver, socket_concurrency, socket_gate, lookup_pool
+    global domain_breaker
+    unknown = set(settings) - set(config)
+    if unknown:
+        raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+    config.update(settings)
+
+    if dns_resolver is not None:
+        dns_resolver.close()
+        dns_resolver = None
+    if lookup_pool is not None:
+        lookup_pool.shutdown(wait=False)
+
+    verdict_store = VerdictStore(config['VERDICT_DB']) if config['VERDICT_DB'] else None
+    address_index = AddressIndex(config['ADDRESS_DB']) if config['ADDRESS_DB'] else None
+    domain_types = domain_index.load(config['DOMAIN_INDEX'])
+    # The socket backend starts at the old fixed pool size and adapts from there
+    socket_concurrency = AdaptiveLimit(initial=30, min_limit=4, max_limit=config['DNS_MAX_THREADS'])
+    socket_gate = ThreadGate(socket_concurrency)
+    lookup_pool = ThreadPoolExecutor(max_workers=2 * config['DNS_MAX_THREADS'], thread_name_prefix='getaddrinfo')
+    domain_breaker = CircuitBreaker(threshold=config['DNS_BREAKER_THRESHOLD'],
+                                    cooldown=config['DNS_BREAKER_COOLDOWN'])
+
+
+# Prometheus metrics; gauges are read from live state at scrape time
+metrics = Registry()
+STAGE_SECONDS = metrics.histogram('email_validator_stage_seconds',
+                                  'Time spent in each pipeline stage (parse, dedup, syntax, dns, write) per run',
+                                  ['stage'])
+DNS_QUERY_SECONDS = metrics.histogram('email_validator_dns_query_seconds',
+                                      'Latency of individual DNS lookups', ['backend', 'outcome'],
+                                      buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5))
+RESULTS_TOTAL = metrics.counter('email_validator_results_total', 'Validated input rows by final status', ['status'])
+ADDRESS_REUSED = metrics.counter('email_validator_address_index_hits_total',
+                                 'Unique addresses answered from the address index by incremental runs')
+metrics.counter('email_validator_cache_requests_total', 'Domain verdict cache lookups', ['cache', 'result'],
+                collect=lambda: cache_requests())
+metrics.gauge('email_validator_cache_hit_ratio', 'Hit ratio of the domain verdict caches', ['cache'],
+              collect=lambda: {(name, ): stats['hit_ratio'] for name, stats in cache_stats().items()})
+metrics.gauge('email_validator_cache_entries', 'Entries held by the domain verdict caches', ['cache'],
+              collect=lambda: {(name, ): stats['size'] for name, stats in cache_stats().items()})
+metrics.gauge('email_validator_dns_inflight', 'DNS lookups currently in flight',
+              collect=lambda: dns_concurrency().stats()['inflight'])
+metrics.gauge('email_validator_dns_concurrency_limit', 'Current adaptive limit on in-flight DNS lookups',
+              collect=lambda: dns_concurrency().stats()['limit'])
+metrics.gauge('email_validator_dns_breaker_open', 'Domains currently failing fast after repeated timeouts',
+              collect=lambda: domain_breaker.stats()['open'])
+
+# Common email domains for quick validation
+COMMON_DOMAINS = {
+    'gmail.com', 'yahoo.com', 'hotmail.com', 'outlook.com', 'aol.com',
+    'icloud.com', 'mail.com', 'zoho.com', 'protonmail.com', 'yandex.com',
+    'live.com', 'msn.com', 'inbox.com', 'gmx.com', 'fastmail.com'
+}
+
+# Verdict used for COMMON_DOMAINS without touching the network
+KNOWN_DOMAIN_VERDICT = {'exists': True, 'mx': True, 'deliverable': True, 'error': False, 'ttl': None}
+
+# Final_Status -> status label used in metrics and the API
+STATUS_KEYS = dict(zip(STATUS_LABELS, STATUS_NAMES))
+
+# Outcomes worth remembering per address; the others are retried on the next run
+SETTLED_STATUSES = (STATUS_VALID, STATUS_NO_MAIL_SERVER, STATUS_INVALID_DOMAIN)
+
+# Verdict for domains left unresolved when a job's deadline ran out (never cached)
+UNCHECKED_VERDICT = {'exists': False, 'mx': False, 'deliverable': False, 'error': True, 'ttl': None,
+                     'unchecked': True}
+
+
+def get_resolver():
+    """Shared async resolver built from config"""
+    global dns_resolver
+    if dns_resolver is None:
+        nameservers = None
+        if config['DNS_RESOLVER']:
+            nameservers = [parse_address(part) for part in config['DNS_RESOLVER'].split(',')]
+        dns_resolver = ResolverThread(AsyncResolver(nameservers=nameservers, timeout=config['DNS_TIMEOUT'],
+                                                    retries=2, max_inflight=config['DNS_MAX_CONCURRENCY'],
+                                                    deadline=config['DNS_LOOKUP_TIMEOUT'],
+                                                    on_query=observe_async_query))
+    return dns_resolver
+
+
+def observe_async_query(seconds, outcome):
+    DNS_QUERY_SECONDS.observe(seconds, backend='async', outcome=outcome)
+
+
+def cache_stats():
+    """Stats of the in-process verdict cache and, once started, the resolver's record cache"""
+    stats = {'domain': domain_cache.stats()}
+    if dns_resolver is not None:
+        stats['dns_records'] = dns_resolver.resolver.records.stats()
+    return stats
+
+
+def cache_requests():
+    samples = {}
+    for name, stats in cache_stats().items():
+        samples[(name, 'hit')] = stats['hits']
+        samples[(name, 'miss')] = stats['misses']
+    return samples
+
+
+def dns_concurrency():
+    """Adaptive in-flight limit of the active DNS backend"""
+    if config['DNS_BACKEND'] == 'async':
+        return get_resolver().resolver.concurrency
+    return socket_concurrency
+
+
+def is_resolver_timeout(error):
+    """True for failures that mean the resolver is overloaded, not that the name is bad"""
+    return isinstance(error, socket.gaierror) and error.errno == socket.EAI_AGAIN
+
+
+def resolve_domain(domain):
+    """Network lookup for a single domain; returns a verdict dict"""
+    if config['DNS_BACKEND'] == 'async':
+        return get_resolver().check_domain(domain)
+
+    # The system resolver cannot see MX records, so an address record
+    # counts as the implicit mail exchanger (RFC 5321) and MX stays False.
+    # A and AAAA are asked at once and the first answer wins; the deadline
+    # only stops the wait, so no socket-wide default timeout is needed.
+    with socket_gate.slot():
+        started = time.monotonic()
+        exists = dropped = False
+        futures = [lookup_pool.submit(socket.getaddrinfo, domain, None, family)
+                   for family in (socket.AF_INET, socket.AF_INET6)]
+        try:
+            for future in as_completed(futures, timeout=config['DNS_LOOKUP_TIMEOUT']):
+                try:
+                    future.result()
+                    exists = True
+                    break
+                except Exception as e:
+                    dropped = dropped or is_resolver_timeout(e)
+        except FuturesTimeout:
+            dropped = True
+        dropped = dropped and not exists
+        elapsed = time.monotonic() - started
+        socket_concurrency.record(elapsed, dropped=dropped)
+        DNS_QUERY_SECONDS.observe(elapsed, backend='socket', outcome='timeout' if dropped else 'answer')
+    if dropped:
+        return timeout_verdict()
+    return {'exists': exists, 'mx': False, 'deliverable': exists, 'error': False, 'ttl': None}
+
+
+def resolve_guarded(domain):
+    """resolve_domain behind the circuit breaker, one query per domain at a time"""
+    if not domain_breaker.allow(domain):
+        return timeout_verdict()
+    verdict = domain_flights.do(domain, lambda: resolve_domain(domain))
+    domain_breaker.record(domain, verdict.get('timeout', False))
+    return verdict
+
+
+def verdict_ttl(verdict):
+    """Cache lifetime for a verdict: its DNS TTL, capped by the cache limits"""
+    limit = domain_cache.positive_ttl if verdict['deliverable'] else domain_cache.negative_ttl
+    return limit if verdict['ttl'] is None else min(verdict['ttl'], limit)
+
+
+def cache_verdict(domain, verdict, persist=True):
+    """Cache a verdict in memory and, unless it was a lookup failure, on disk"""
+    if verdict.get('timeout'):
+        # Retries of unresponsive domains are paced by domain_breaker instead
+        return
+    ttl = verdict_ttl(verdict)
+    domain_cache.set(domain, verdict, ttl)
+    if persist and verdict_store is not None and not verdict['error']:
+        verdict_store.put(domain, verdict, ttl)
+
+
+def check_domain(domain):
+    """Cached mail-routing verdict for a domain"""
+    domain = domain.lower()
+    if domain in COMMON_DOMAINS:
+        return KNOWN_DOMAIN_VERDICT
+
+    verdict = domain_cache.get(domain)
+    if verdict is None and verdict_store is not None:
+        verdict = verdict_store.get(domain)
+        if verdict is not None:
+            cache_verdict(domain, verdict, persist=False)
+    if verdict is None:
+        verdict = resolve_guarded(domain)
+        cache_verdict(domain, verdict)
+    return verdict
+
+
+def check_domain_exists(domain):
+    """Fast domain existence check (cached)"""
+    return check_domain(domain)['exists']
+
+
+def group_by_domain(emails):
+    """Batch syntax pass, then group the positions of valid emails by domain
+
+    Returns (groups, malformed, reason_counts) where groups maps a domain to
+    indexes into emails and malformed lists the indexes that never reach DNS.
+    """
+    groups = {}
+    malformed = []
+    reason_counts = {}
+    index = 0
+    for batch, mask, reasons in iter_syntax_batches(emails):
+        for email, valid, reason in zip(batch, mask.tolist(), reasons.tolist()):
+            if valid:
+                groups.setdefault(email.rsplit('@', 1)[-1].lower(), []).append(index)
+            else:
+                malformed.append(index)
+                reason_counts[reason] = reason_counts.get(reason, 0) + 1
+            index += 1
+    return groups, malformed, reason_counts
+
+
+def time_left(deadline):
+    """Seconds until a time.monotonic() deadline (None for no deadline)"""
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+def check_domains(domains, max_workers=None, deadline=None):
+    """Resolve each distinct domain exactly once
+
+    Domains still unresolved at the deadline get UNCHECKED_VERDICT.
+    """
+    if config['DNS_BACKEND'] == 'async':
+        return check_domains_async(domains, deadline)
+
+    # Threads beyond the adaptive limit wait on socket_gate inside resolve_domain
+    verdicts = {}
+    executor = ThreadPoolExecutor(max_workers=max_workers or config['DNS_MAX_THREADS'])
+    try:
+        future_to_domain = {executor.submit(check_domain, domain): domain for domain in domains}
+
+        for future in as_completed(future_to_domain, timeout=time_left(deadline)):
+            domain = future_to_domain[future]
+            try:
+                verdicts[domain] = future.result()
+            except:
+                verdicts[domain] = error_verdict()
+    except FuturesTimeout:
+        for domain in domains:
+            verdicts.setdefault(domain, UNCHECKED_VERDICT)
+    finally:
+        # Past the deadline, queued lookups are dropped and running ones finish unwatched
+        for future in future_to_domain:
+            future.cancel()
+        executor.shutdown(wait=False)
+    return verdicts
+
+
+def check_domains_async(domains, deadline=None):
+    """Resolve distinct domains concurrently on the async resolver"""
+    verdicts = {}
+    pending = []
+    for domain in domains:
+        if domain in COMMON_DOMAINS:
+            verdicts[domain] = KNOWN_DOMAIN_VERDICT
+            continue
+        verdict = domain_cache.get(domain)
+        if verdict is not None:
+            verdicts[domain] = verdict
+        elif not domain_breaker.allow(domain):
+            verdicts[domain] = timeout_verdict()
+        else:
+            pending.append(domain)
+
+    if pending and verdict_store is not None:
+        stored = verdict_store.get_many(pending)
+        for domain, verdict in stored.items():
+            cache_verdict(domain, verdict, persist=False)
+            verdicts[domain] = verdict
+        pending = [domain for domain in pending if domain not in stored]
+
+    if pending:
+        resolved = get_resolver().check_many(pending, timeout=time_left(deadline))
+        for domain in pending:
+            if domain not in resolved:
+                verdicts[domain] = UNCHECKED_VERDICT
+        for domain, verdict in resolved.items():
+            domain_breaker.record(domain, verdict.get('timeout', False))
+            cache_verdict(domain, verdict, persist=False)
+            verdicts[domain] = verdict
+        if verdict_store is not None:
+            verdict_store.put_many((domain, verdict, verdict_ttl(verdict))
+                                   for domain, verdict in resolved.items() if not verdict['error'])
+    return verdicts
+
+
+def warm_start():
+    """Drop expired stored verdicts and preload the hottest ones into memory"""
+    if address_index is not None:
+        removed = address_index.compact(config['ADDRESS_MAX_AGE'])
+        log.info("Address index loaded", extra={'addresses': len(address_index), 'expired_removed': removed})
+    if verdict_store is None:
+        return
+    removed = verdict_store.compact()
+    preloaded = verdict_store.hottest(config['VERDICT_PRELOAD'])
+    for domain, verdict in preloaded:
+        domain_cache.set(domain, verdict, verdict_ttl(verdict))
+    log.info("Verdict store loaded", extra={'preloaded': len(preloaded), 'expired_removed': removed})
+
+
+def check_email(email, domain_verdicts=None, syntax_valid=None):
+    """Accurate email validation with domain checking"""
+    result = {
+        "Email": email,
+        "Syntax_Valid": False,
+        "Domain_Exists": False,
+        "MX_Record": False,
+        "Final_Status": "❌ Invalid",
+        "Type": ""
+    }
+
+    try:
+        if syntax_valid is None:
+            syntax_valid = validate_email_syntax(email)
+        if not syntax_valid:
+            result["Final_Status"] = "❌ Invalid Syntax"
+            return result
+
+        result["Syntax_Valid"] = True
+        local, domain = email.rsplit('@', 1)
+        domain = domain.lower()
+        kind = classify(local, domain_types.lookup(domain))
+        result["Type"] = TYPE_LABELS[kind]
+        if kind == TYPE_DISPOSABLE and config['DROP_DISPOSABLE']:
+            result["Final_Status"] = STATUS_LABELS[STATUS_DISPOSABLE]
+            return result
+
+        if domain_verdicts is not None and domain in domain_verdicts:
+            verdict = domain_verdicts[domain]
+        else:
+            verdict = check_domain(domain)
+
+        result["Domain_Exists"] = verdict['exists']
+        result["MX_Record"] = verdict['mx']
+        result["Final_Status"] = STATUS_LABELS[verdict_status(verdict)[0]]
+
+    except:
+        result["Final_Status"] = "❌ Error"
+
+    return result
+
+
+def report_progress(job, batch):
+    """Push a ResultBatch (or a list of check_email() results) into the status metrics and the job's live counters"""
+    if not isinstance(batch, ResultBatch):
+        batch = ResultBatch.from_results(batch)
+    report_counts(job, batch.counts().tolist())
+
+
+def report_counts(job, counts):
+    """Push input rows per status code into the status metrics and the job's live counters"""
+    for code, count in enumerate(counts):
+        if count:
+            RESULTS_TOTAL.inc(count, status=STATUS_NAMES[code])
+
+    if job is not None:
+        valid = counts[STATUS_VALID]
+        job.advance(valid, sum(counts) - valid, counts[STATUS_UNCHECKED])
+
+
+def domain_status(domain, verdicts):
+    """(status code, flags) shared by every syntactically valid address at a domain"""
+    try:
+        verdict = verdicts[domain] if domain in verdicts else check_domain(domain)
+        status, flags = verdict_status(verdict)
+    except Exception:
+        log.exception("Domain check failed", extra={'domain': domain})
+        status, flags = STATUS_ERROR, 0
+    return status, flags | FLAG_SYNTAX
+
+
+def iter_validation_batches(emails, job=None, domain_batch=2000, counts=None, deadline=None, skip_batches=0,
+                            incremental=False):
+    """Yield ResultBatches, resolving each distinct domain once
+
+    counts gives the number of input rows behind each (deduplicated) email;
+    it is attached to the results as Occurrences. Once the time.monotonic()
+    deadline passes, the remaining domains are reported as Unchecked.
+
+    The same emails always give the same sequence of batches; skip_batches
+    leaves out (without resolving) the first ones, e.g. those a resumed job
+    already has on disk.
+
+    Settled outcomes are recorded in the address index. With incremental,
+    addresses it checked within ADDRESS_MAX_AGE keep that outcome, and only
+    domains with a new or stale address are looked up. Every address is
+    tagged with its type; with DROP_DISPOSABLE, disposable domains are
+    reported as Disposable without a lookup.
+    """
+    def batch_of(indexes, status, flags):
+        return ResultBatch([emails[index] for index in indexes], status, flags,
+                           None if counts is None else counts[indexes], indexes)
+
+    with STAGE_SECONDS.time(stage='syntax'):
+        groups, malformed, reason_counts = group_by_domain(emails)
+    log.info("Syntax checked", extra={
+        'job': job.id if job is not None else None,
+        'domains': len(groups),
+        'malformed': len(malformed),
+        'invalid_syntax': {REASON_LABELS[reason]: count for reason, count in sorted(reason_counts.items())},
+    })
+
+    # Malformed addresses never need DNS
+    if skip_batches < 1:
+        malformed = np.array(malformed, dtype=np.intp)
+        batch = batch_of(malformed, np.full(len(malformed), STATUS_INVALID_SYNTAX), np.zeros(len(malformed)))
+        report_progress(job, batch)
+        yield batch
+
+    # Resolve domains a slice at a time so progress moves while DNS runs
+    domains = list(groups)
+    dns_seconds = 0.0
+    reused = skipped = 0
+    for number, start in enumerate(range(0, len(domains), domain_batch), 1):
+        if number < skip_batches:
+            continue
+        chunk = domains[start:start + domain_batch]
+        sizes = [len(groups[domain]) for domain in chunk]
+        indexes = np.fromiter((index for domain in chunk for index in groups[domain]), dtype=np.intp, count=sum(sizes))
+
+        # Classify before any DNS work, so junk domains never cost a lookup
+        kinds = np.fromiter((domain_types.lookup(domain) for domain in chunk), dtype=np.uint8, count=len(chunk))
+        types = np.fromiter((classify(emails[index].rsplit('@', 1)[0], kind)
+                             for index, kind in zip(indexes.tolist(), np.repeat(kinds, sizes).tolist())),
+                            dtype=np.uint8, count=len(indexes))
+        dropped = kinds == TYPE_DISPOSABLE if config['DROP_DISPOSABLE'] else np.zeros(len(chunk), dtype=bool)
+        done = np.repeat(dropped, sizes)
+
+        hashes = known = fresh = None
+        if address_index is not None:
+            hashes = [address_hash(emails[index]) for index in indexes.tolist()]
+            if incremental:
+                known = address_index.get_many(hashes, config['ADDRESS_MAX_AGE'])
+        if known:
+            fresh = np.fromiter((key in known for key in hashes), dtype=bool, count=len(hashes)) & ~done
+            done |= fresh
+        # A domain needs a lookup only if one of its addresses is still open
+        settled = np.logical_and.reduceat(done, np.cumsum(sizes) - sizes) if chunk else np.zeros(0, dtype=bool)
+        lookup = [domain for domain, closed in zip(chunk, settled.tolist()) if not closed]
+        skipped += int((settled & ~dropped).sum())
+
+        if deadline is not None and time.monotonic() >= deadline:
+            verdicts = dict.fromkeys(lookup, UNCHECKED_VERDICT)
+        else:
+            started = time.perf_counter()
+            verdicts = check_domains(lookup, deadline=deadline) if lookup else {}
+            dns_seconds += time.perf_counter() - started
+        # Every address at a domain shares its outcome, so work per domain and broadcast to the rows
+        needed = set(lookup)
+        outcomes = np.array([(STATUS_DISPOSABLE, FLAG_SYNTAX) if drop else
+                             domain_status(domain, verdicts) if domain in needed else (STATUS_ERROR, 0)
+                             for domain, drop in zip(chunk, dropped.tolist())], dtype=np.uint8).reshape(-1, 2)
+        status = np.repeat(outcomes[:, 0], sizes)
+        flags = np.repeat(outcomes[:, 1], sizes)
+        settle = np.isin(status, SETTLED_STATUSES)
+        if fresh is not None:
+            cached = np.array([known[key] for key, hit in zip(hashes, fresh.tolist()) if hit],
+                              dtype=np.uint8).reshape(-1, 2)
+            status[fresh] = cached[:, 0]
+            flags[fresh] = cached[:, 1] & CHECK_MASK
+            settle &= ~fresh
+            reused += len(cached)
+            ADDRESS_REUSED.inc(len(cached))
+        flags |= types << TYPE_SHIFT
+        if hashes is not None:
+            address_index.put_many((hashes[row], int(status[row]), int(flags[row]))
+                                   for row in np.flatnonzero(settle).tolist())
+
+        batch = batch_of(indexes, status, flags)
+        report_progress(job, batch)
+        yield batch
+    STAGE_SECONDS.observe(dns_seconds, stage='dns')
+    if incremental:
+        log.info("Reused recent verdicts", extra={'job': job.id if job is not None else None,
+                                                  'addresses': reused, 'domains_skipped': skipped})
+
+
+def validate_stream(chunks, tally, job=None, deadline=None, incremental=False, settled=None):
+    """Validate lists of emails as they arrive, e.g. from an upload still in flight
+
+    Each chunk is deduplicated with deduplicate(), then merged into tally, a
+    StreamingDedup; new addresses are validated right away and yielded as
+    ResultBatches, their Occurrences as counted so far. Later duplicates
+    only add to the tally: once chunks is exhausted, batches already
+    written are brought up to date with
+    revise_occurrences(stream, tally.occurrences) if tally.revised.
+
+    settled maps canonical keys to the status of addresses a resumed job
+    already has results for; they count towards progress but are neither
+    validated nor yielded again.
+
+    Unlike deduplicate() on a whole list, the cross-chunk index can't fall
+    back to hash partitions on disk past MAX_IN_MEMORY_KEYS: partitioning
+    needs every row before the first address is validated, which is what
+    streaming avoids. It holds one key per distinct address; MAX_UPLOAD_MB
+    bounds the input.
+    """
+    pending = tally.PENDING
+    if settled:
+        tally.revised = True  # saved batches were written with the counts of their time
+    for chunk in chunks:
+        new = []
+        emails = []
+        late = [0] * len(STATUS_LABELS)
+        known = [0] * len(STATUS_LABELS)
+        local = deduplicate(chunk, fold_aliases=tally.fold_aliases)
+        for email, count in zip(local.unique, local.counts.tolist()):
+            key = tally.key(email)
+            uid, added = tally.add(key, count)
+            code = settled.get(key) if added and settled else None
+            if code is not None:
+                tally.status[uid] = code
+                known[code] += count
+            elif added:
+                new.append(uid)
+                emails.append(email)
+            elif tally.status[uid] != pending:
+                late[tally.status[uid]] += count
+                tally.revised = True
+        if job is not None:
+            job.set_status('validating', total=tally.rows, unique=len(tally))
+            if any(known):
+                job.advance(known[STATUS_VALID], sum(known) - known[STATUS_VALID], known[STATUS_UNCHECKED])
+        report_counts(job, late)
+
+        ids = np.array(new, dtype=np.intp)
+        new_counts = np.fromiter((tally.counts[uid] for uid in new), dtype=np.int64, count=len(new))
+        for batch in iter_validation_batches(emails, job, counts=new_counts, deadline=deadline,
+                                             incremental=incremental):
+            for uid, code in zip(ids[batch.indexes].tolist(), batch.status.tolist()):
+                tally.status[uid] = code
+            yield batch
+
+
+def validate_emails(emails, job=None, deadline=None, incremental=False):
+    """Validate emails, resolving each distinct domain once; returns check_email()-style dicts"""
+    batches = iter_validation_batches(emails, job, deadline=deadline, incremental=incremental)
+    return [result for batch in batches for result in batch.to_dicts()]
+
+
+configure()
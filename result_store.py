@@ -0,0 +1,157 @@
+"""
+Per-job result storage
+Results are kept in memory for small jobs and spilled to disk for large
+ones; finished results are evicted by age and a total byte budget
+"""
+
+import io
+import os
+import threading
+import time
+
+
+class ResultBlob:
+    """Write-once result file for one job"""
+
+    def __init__(self, path, spill_threshold):
+        self.path = path
+        self.spill_threshold = spill_threshold
+        self.size = 0
+        self.closed = False
+        self.created_at = time.time()
+        self.closed_at = None
+        self.on_close = None  # on_close(blob) once the result is complete
+        self._buffer = io.BytesIO()
+        self._file = None
+
+    @classmethod
+    def from_file(cls, path):
+        """Closed blob over a finished result file that already exists"""
+        blob = cls(path, 0)
+        blob._buffer = None
+        blob.size = os.path.getsize(path)
+        blob.closed = True
+        blob.closed_at = os.path.getmtime(path)
+        return blob
+
+    @property
+    def on_disk(self):
+        return self._buffer is None
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if self._file is None and self.size + len(data) > self.spill_threshold:
+            # Too big for memory: move what we have to disk and keep appending there
+            self._file = open(self.path, 'w+b')
+            self._file.write(self._buffer.getvalue())
+            self._buffer = None
+        (self._file or self._buffer).write(data)
+        self.size += len(data)
+        return len(data)
+
+    def rewrite(self, update):
+        """Let update(stream) change what has been written so far in place, before close()"""
+        stream = self._file or self._buffer
+        stream.seek(0)
+        update(stream)
+        stream.seek(0, os.SEEK_END)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.closed = True
+        self.closed_at = time.time()
+        if self.on_close is not None:
+            self.on_close(self)
+
+    def open(self):
+        """Independent binary reader over the finished result"""
+        if self._buffer is not None:
+            return io.BytesIO(self._buffer.getbuffer())
+        return open(self.path, 'rb')
+
+    def discard(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._buffer = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class ResultStore:
+    """Job ID -> ResultBlob with age and byte-budget eviction"""
+
+    def __init__(self, directory, spill_threshold=8 * 1024 * 1024,
+                 max_bytes=1024 * 1024 * 1024, max_age=6 * 3600):
+        self.directory = directory
+        self.spill_threshold = spill_threshold
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._blobs = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def create(self, job_id):
+        return self._add(job_id, ResultBlob(self._path(job_id), self.spill_threshold))
+
+    def adopt(self, job_id, path):
+        """Take over a finished result file written elsewhere; it is moved into the store"""
+        self.discard(job_id)
+        os.replace(path, self._path(job_id))
+        blob = ResultBlob.from_file(self._path(job_id))
+        blob.closed_at = time.time()
+        return self._add(job_id, blob)
+
+    def _path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.results")
+
+    def _add(self, job_id, blob):
+        with self._lock:
+            old = self._blobs.pop(job_id, None)
+            self._blobs[job_id] = blob
+        if old is not None:
+            old.discard()
+        return blob
+
+    def get(self, job_id):
+        """Finished result for a job, or None"""
+        with self._lock:
+            blob = self._blobs.get(job_id)
+        return blob if blob is not None and blob.closed else None
+
+    def discard(self, job_id):
+        with self._lock:
+            blob = self._blobs.pop(job_id, None)
+        if blob is not None:
+            blob.discard()
+
+    def evict(self):
+        """Drop finished results past max_age, then the oldest until under max_bytes"""
+        now = time.time()
+        removed = []
+        with self._lock:
+            finished = sorted((blob.closed_at, job_id) for job_id, blob in self._blobs.items() if blob.closed)
+            total = sum(blob.size for blob in self._blobs.values())
+            for closed_at, job_id in finished:
+                if now - closed_at <= self.max_age and total <= self.max_bytes:
+                    break
+                blob = self._blobs.pop(job_id)
+                total -= blob.size
+                removed.append(blob)
+        for blob in removed:
+            blob.discard()
+        return len(removed)
+
+    def stats(self):
+        with self._lock:
+            blobs = list(self._blobs.values())
+        return {
+            'jobs': len(blobs),
+            'bytes': sum(blob.size for blob in blobs),
+            'on_disk': sum(1 for blob in blobs if blob.on_disk),
+        }
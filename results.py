@@ -0,0 +1,166 @@
+"""
+Columnar validation results
+A batch of results is a list of addresses plus numpy columns: a uint8
+status code, a uint8 of bit-packed check flags and a uint32 occurrence
+count. Labels like "✅ Valid" only appear when a batch is rendered.
+"""
+
+import struct
+from itertools import compress
+
+import numpy as np
+
+from domain_index import TYPE_LABELS
+
+# Status codes; the position in each tuple below is the code
+STATUS_VALID = 0
+STATUS_INVALID_SYNTAX = 1
+STATUS_NO_MAIL_SERVER = 2
+STATUS_INVALID_DOMAIN = 3
+STATUS_DOMAIN_TIMEOUT = 4
+STATUS_UNCHECKED = 5
+STATUS_ERROR = 6
+STATUS_DISPOSABLE = 7
+
+STATUS_LABELS = ("✅ Valid", "❌ Invalid Syntax", "⚠️ No Mail Server", "⚠️ Invalid Domain",
+                 "⏱️ Domain Timeout", "⏳ Unchecked", "❌ Error", "🗑️ Disposable")
+STATUS_NAMES = ('valid', 'invalid_syntax', 'no_mail_server', 'invalid_domain',
+                'domain_timeout', 'unchecked', 'error', 'disposable')
+STATUS_CODES = {label: code for code, label in enumerate(STATUS_LABELS)}
+
+# Check flags, OR-ed together in one byte per row; bits 3-5 hold the address type (domain_index.TYPE_*)
+FLAG_SYNTAX = 1
+FLAG_DOMAIN = 2
+FLAG_MX = 4
+TYPE_SHIFT = 3
+CHECK_MASK = (1 << TYPE_SHIFT) - 1
+
+# Columns of a rendered result (plus the dedup count and address type), in download order
+RESULT_FIELDS = ["Email", "Syntax_Valid", "Domain_Exists", "MX_Record", "Final_Status", "Occurrences", "Type"]
+TYPE_CODES = {label: code for code, label in enumerate(TYPE_LABELS)}
+
+# Encoded batch header: magic, rows, bytes of UTF-8 address data
+_MAGIC = b'RB01'
+_HEADER = struct.Struct('<4sII')
+
+
+def verdict_status(verdict):
+    """(status code, domain flags) for a domain verdict; the caller adds FLAG_SYNTAX"""
+    flags = (FLAG_DOMAIN if verdict['exists'] else 0) | (FLAG_MX if verdict['mx'] else 0)
+    if verdict['deliverable']:
+        return STATUS_VALID, flags
+    if verdict.get('unchecked'):
+        return STATUS_UNCHECKED, flags
+    if verdict.get('timeout'):
+        return STATUS_DOMAIN_TIMEOUT, flags
+    if verdict['exists']:
+        return STATUS_NO_MAIL_SERVER, flags
+    return STATUS_INVALID_DOMAIN, flags
+
+
+class ResultBatch:
+    """Validation results for a list of addresses, one row per address
+
+    indexes, when known, are the rows' positions in the list of addresses
+    they were validated from; they are not encoded.
+    """
+
+    def __init__(self, emails, status, flags, occurrences=None, indexes=None):
+        self.emails = emails
+        self.indexes = indexes
+        self.status = np.asarray(status, dtype=np.uint8)
+        self.flags = np.asarray(flags, dtype=np.uint8)
+        if occurrences is None:
+            self.occurrences = np.ones(len(emails), dtype=np.uint32)
+        else:
+            self.occurrences = np.asarray(occurrences, dtype=np.uint32)
+
+    @classmethod
+    def from_results(cls, results):
+        """Batch from check_email() result dicts"""
+        flags = [(FLAG_SYNTAX if result["Syntax_Valid"] else 0) | (FLAG_DOMAIN if result["Domain_Exists"] else 0)
+                 | (FLAG_MX if result["MX_Record"] else 0) | TYPE_CODES.get(result.get("Type"), 0) << TYPE_SHIFT
+                 for result in results]
+        return cls([result["Email"] for result in results],
+                   [STATUS_CODES.get(result["Final_Status"], STATUS_ERROR) for result in results],
+                   flags, [result.get("Occurrences", 1) for result in results])
+
+    def __len__(self):
+        return len(self.emails)
+
+    def counts(self):
+        """Input rows per status code (occurrences included), indexed by code"""
+        return np.bincount(self.status, weights=self.occurrences,
+                           minlength=len(STATUS_LABELS)).astype(np.int64)
+
+    def select(self, kind):
+        """Rows for a download type: 'valid', 'invalid' or 'all'"""
+        if kind == 'all':
+            return self
+        mask = self.status == STATUS_VALID
+        if kind == 'invalid':
+            mask = ~mask
+        return ResultBatch(list(compress(self.emails, mask.tolist())), self.status[mask],
+                           self.flags[mask], self.occurrences[mask])
+
+    def rows(self):
+        """RESULT_FIELDS rows with labels, for CSV output"""
+        labels = [STATUS_LABELS[code] for code in self.status.tolist()]
+        types = [TYPE_LABELS[code] for code in (self.flags >> TYPE_SHIFT).tolist()]
+        return zip(self.emails, ((self.flags & FLAG_SYNTAX) != 0).tolist(), ((self.flags & FLAG_DOMAIN) != 0).tolist(),
+                   ((self.flags & FLAG_MX) != 0).tolist(), labels, self.occurrences.tolist(), types)
+
+    def to_dicts(self):
+        """check_email()-style result dicts"""
+        return [dict(zip(RESULT_FIELDS, row)) for row in self.rows()]
+
+    def encode(self):
+        """Binary record: header, address lengths, UTF-8 addresses, then the three columns"""
+        encoded = [email.encode('utf-8') for email in self.emails]
+        lengths = np.fromiter(map(len, encoded), dtype='<u4', count=len(encoded))
+        data = b''.join(encoded)
+        return b''.join((_HEADER.pack(_MAGIC, len(encoded), len(data)), lengths.tobytes(), data,
+                         self.status.tobytes(), self.flags.tobytes(), self.occurrences.astype('<u4').tobytes()))
+
+
+def _read_exact(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        raise ValueError("Truncated result batch")
+    return data
+
+
+def read_batches(stream):
+    """Yield the ResultBatch records written to a binary stream with encode()"""
+    while True:
+        header = stream.read(_HEADER.size)
+        if not header:
+            return
+        if len(header) != _HEADER.size:
+            raise ValueError("Truncated result batch")
+        magic, rows, size = _HEADER.unpack(header)
+        if magic != _MAGIC:
+            raise ValueError("Not a result batch")
+        ends = np.cumsum(np.frombuffer(_read_exact(stream, rows * 4), dtype='<u4'), dtype=np.int64).tolist()
+        data = _read_exact(stream, size)
+        emails = [data[start:end].decode('utf-8') for start, end in zip([0] + ends, ends)]
+        status = np.frombuffer(_read_exact(stream, rows), dtype=np.uint8)
+        flags = np.frombuffer(_read_exact(stream, rows), dtype=np.uint8)
+        occurrences = np.frombuffer(_read_exact(stream, rows * 4), dtype='<u4')
+        yield ResultBatch(emails, status, flags, occurrences)
+
+
+def revise_occurrences(stream, occurrences):
+    """Rewrite, in place, the Occurrences column of the batches from a stream's position on
+
+    occurrences(emails) gives a batch's new column; the stream must be
+    seekable and open for update. Batches whose column is unchanged are
+    not written.
+    """
+    for batch in read_batches(stream):
+        column = np.asarray(occurrences(batch.emails), dtype='<u4')
+        if not np.array_equal(column, batch.occurrences):
+            # The column ends the record, so it sits just before the stream position
+            end = stream.tell()
+            stream.seek(end - column.nbytes)
+            stream.write(column.tobytes())
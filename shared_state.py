@@ -0,0 +1,206 @@
+"""
+Shared state for multi-process deployments
+Job progress and the index of finished results live in one SQLite file in
+WAL mode, so any worker process (gunicorn -w N) can answer /jobs,
+/progress and /download for a job that another worker runs
+"""
+
+import json
+import os
+import time
+
+from jobs import JobManager, snapshot_of
+from result_store import ResultBlob, ResultStore
+from sqlite_store import SQLiteStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id      TEXT PRIMARY KEY,
+    status      TEXT NOT NULL,
+    finished_at REAL,
+    state       TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    job_id    TEXT PRIMARY KEY,
+    path      TEXT NOT NULL,
+    size      INTEGER NOT NULL,
+    closed_at REAL NOT NULL
+);
+"""
+
+FINISHED = ('done', 'failed')
+
+
+class StateDB(SQLiteStore):
+    """Job states and result locations shared by every process on the host"""
+
+    schema = SCHEMA
+
+    def save_job(self, state):
+        self._conn().execute(
+            "INSERT INTO jobs (job_id, status, finished_at, state) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(job_id) DO UPDATE SET status = excluded.status, "
+            "finished_at = excluded.finished_at, state = excluded.state",
+            (state['job_id'], state['status'], state['finished_at'], json.dumps(state)),
+        )
+
+    def load_job(self, job_id):
+        row = self._conn().execute("SELECT state FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def job_counts(self):
+        return dict(self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def prune_jobs(self, cutoff):
+        """Delete jobs that finished before cutoff; returns their IDs"""
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            expired = [row[0] for row in conn.execute(
+                "SELECT job_id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (cutoff,))]
+            conn.executemany("DELETE FROM jobs WHERE job_id = ?", [(job_id,) for job_id in expired])
+        return expired
+
+    def add_result(self, job_id, path, size, closed_at):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO results (job_id, path, size, closed_at) VALUES (?, ?, ?, ?)",
+            (job_id, path, size, closed_at),
+        )
+
+    def get_result(self, job_id):
+        """(path, size, closed_at) of a finished result, or None"""
+        return self._conn().execute("SELECT path, size, closed_at FROM results WHERE job_id = ?",
+                                    (job_id,)).fetchone()
+
+    def remove_result(self, job_id):
+        self._conn().execute("DELETE FROM results WHERE job_id = ?", (job_id,))
+
+    def results(self):
+        """(closed_at, job_id, path, size) of every finished result, oldest first"""
+        return self._conn().execute("SELECT closed_at, job_id, path, size FROM results ORDER BY closed_at").fetchall()
+
+
+class RemoteJob:
+    """Read-only view of a job that another process is running"""
+
+    poll_interval = 0.25
+
+    def __init__(self, db, state):
+        self.db = db
+        self.state = state
+
+    @property
+    def id(self):
+        return self.state['job_id']
+
+    @property
+    def finished(self):
+        return self.state['status'] in FINISHED
+
+    def _refresh(self):
+        self.state = self.db.load_job(self.id) or self.state
+
+    def wait(self, version, timeout):
+        """Poll until the job changes past the given version or timeout elapses"""
+        deadline = time.monotonic() + timeout
+        self._refresh()
+        while self.state['version'] == version and time.monotonic() < deadline:
+            time.sleep(min(self.poll_interval, max(0.0, deadline - time.monotonic())))
+            self._refresh()
+        return self.state['version']
+
+    def snapshot(self):
+        self._refresh()
+        return snapshot_of(self.state)
+
+
+class SharedJobManager(JobManager):
+    """JobManager whose jobs are visible, read-only, from every process"""
+
+    def __init__(self, db, max_workers=4):
+        super().__init__(max_workers)
+        self.db = db
+
+    def on_change(self, job):
+        self.db.save_job(job.state())
+
+    def get(self, job_id):
+        job = super().get(job_id)
+        if job is not None:
+            return job
+        state = self.db.load_job(job_id)
+        return RemoteJob(self.db, state) if state is not None else None
+
+    def prune(self, max_age):
+        return sorted(set(super().prune(max_age)) | set(self.db.prune_jobs(time.time() - max_age)))
+
+    def active(self):
+        return sum(count for status, count in self.db.job_counts().items() if status not in FINISHED)
+
+    def by_status(self):
+        counts = dict.fromkeys(('queued', 'parsing', 'validating', 'done', 'failed'), 0)
+        counts.update(self.db.job_counts())
+        return counts
+
+
+class SharedResultStore(ResultStore):
+    """ResultStore that keeps every result on disk and indexes finished ones in the shared database"""
+
+    def __init__(self, db, directory, max_bytes=1024 * 1024 * 1024, max_age=6 * 3600):
+        super().__init__(directory, spill_threshold=0, max_bytes=max_bytes, max_age=max_age)
+        self.db = db
+
+    def _publish(self, job_id, blob):
+        if blob.on_disk:
+            self.db.add_result(job_id, os.path.abspath(blob.path), blob.size, blob.closed_at)
+
+    def create(self, job_id):
+        blob = super().create(job_id)
+        blob.on_close = lambda closed: self._publish(job_id, closed)
+        return blob
+
+    def adopt(self, job_id, path):
+        blob = super().adopt(job_id, path)
+        self._publish(job_id, blob)
+        return blob
+
+    def get(self, job_id):
+        blob = super().get(job_id)
+        if blob is not None:
+            return blob
+        row = self.db.get_result(job_id)
+        if row is None or not os.path.exists(row[0]):
+            return None
+        return ResultBlob.from_file(row[0])
+
+    def discard(self, job_id):
+        super().discard(job_id)
+        row = self.db.get_result(job_id)
+        if row is not None:
+            self.db.remove_result(job_id)
+            try:
+                os.remove(row[0])
+            except OSError:
+                pass
+
+    def evict(self):
+        """Drop finished results of every process past max_age, then the oldest until under max_bytes"""
+        now = time.time()
+        rows = self.db.results()
+        total = sum(size for _, _, _, size in rows)
+        removed = 0
+        for closed_at, job_id, path, size in rows:
+            if now - closed_at <= self.max_age and total <= self.max_bytes:
+                break
+            self.discard(job_id)
+            total -= size
+            removed += 1
+        return removed
+
+    def stats(self):
+        rows = self.db.results()
+        return {
+            'jobs': len(rows),
+            'bytes': sum(size for _, _, _, size in rows),
+            'on_disk': len(rows),
+        }
@@ -0,0 +1,34 @@
+"""
+SQLite-backed stores
+Common base of the verdict store, the address index and the shared job
+state: one SQLite file in WAL mode, so several processes can read it while
+one writes, reached through a connection per thread
+"""
+
+import os
+import sqlite3
+import threading
+
+
+class SQLiteStore:
+    """Opens (and creates, with the subclass's schema) one SQLite database file"""
+
+    schema = ''
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript(self.schema)
+
+    def _conn(self):
+        # sqlite3 connections are not shareable across threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
@@ -0,0 +1,62 @@
+"""
+JSON API input handling
+"""
+
+import importlib
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope='module')
+def client(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp('api')
+    cwd = os.getcwd()
+    env = {'VERDICT_DB': '', 'ADDRESS_DB': '', 'SHARED_STATE_DB': '', 'LOG_LEVEL': 'WARNING'}
+    saved = {name: os.environ.get(name) for name in env}
+    os.environ.update(env)
+    os.chdir(workdir)
+    try:
+        main = importlib.import_module('main')
+        yield main.app.test_client()
+    finally:
+        os.chdir(cwd)
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+@pytest.mark.parametrize('body', [['x'], 'a@b.com', 42])
+def test_check_rejects_non_object_json(client, body):
+    response = client.post('/api/v1/check', json=body)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'JSON body must be an object'}
+
+
+def test_check_requires_email(client):
+    response = client.post('/api/v1/check', json={'id': 7})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': "missing 'email'"}
+
+
+def check_stream(client, body):
+    response = client.post('/api/v1/check/stream', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 200
+    return {result['id']: result for result in map(json.loads, response.get_data(as_text=True).splitlines())}
+
+
+def test_check_stream_reads_json_strings_and_numbers_lines_from_one(client):
+    results = check_stream(client, b'not-an-email\n\n"quoted-but-invalid"\n{"email": "x", "id": "a"}\n"unterminated\n')
+    assert sorted(results, key=str) == [1, 3, 5, 'a']
+    assert results[1]['email'] == 'not-an-email'
+    assert results[3]['email'] == 'quoted-but-invalid'
+    assert results['a']['email'] == 'x'
+    assert all(results[key]['status'] == 'invalid_syntax' for key in (1, 3, 'a'))
+    assert results[5]['error'].startswith('bad input line')
@@ -0,0 +1,74 @@
+"""
+A killed job resumes from the result batches its checkpoint saved, whatever
+the process managed to write after them
+"""
+
+import json
+import os
+import signal
+import time
+import urllib.request
+
+import pytest
+
+from test_upload_resume import start_server, upload  # also puts the app on sys.path
+
+import benchmark  # noqa: E402
+
+
+def wait_for(predicate, seconds, message):
+    deadline = time.monotonic() + seconds
+    while not predicate():
+        assert time.monotonic() < deadline, message
+        time.sleep(0.05)
+
+
+@pytest.mark.parametrize('tail', ['partial', 'whole'])
+def test_resume_ignores_results_after_saved_offset(tmp_path, tail):
+    source = tmp_path / 'in.zip'
+    emails = benchmark.generate_emails(6000, domains=5000, zipf=0.5)
+    benchmark.write_zip(str(source), emails)
+
+    with benchmark.StubDNSServer(latency=0.2) as stub:
+        proc, url = start_server(tmp_path, stub.address)
+        try:
+            job_id = upload(url, 'in.zip', source.read_bytes())['job_id']
+            manifest = tmp_path / 'uploads' / 'jobs' / job_id / 'manifest.json'
+
+            def saved_batches():
+                try:
+                    return json.loads(manifest.read_text())['batches'] >= 2
+                except (OSError, ValueError):
+                    return False
+            wait_for(saved_batches, 60, 'no result batch was checkpointed')
+            snapshot = json.load(urllib.request.urlopen(f'{url}/jobs/{job_id}'))
+            assert snapshot['status'] != 'done'
+        finally:
+            proc.send_signal(signal.SIGKILL)
+            proc.wait()
+
+        # Bytes written after the last save: a batch cut off mid-write, or whole unsaved batches
+        checkpoint = manifest.parent
+        offset = json.loads(manifest.read_text())['offset']
+        results = checkpoint / 'results.bin'
+        saved = results.read_bytes()[:offset]
+        with open(results, 'r+b') as f:
+            f.truncate(offset)
+            f.seek(offset)
+            f.write(saved[:20] if tail == 'partial' else saved)
+
+        proc, url = start_server(tmp_path, stub.address)
+        try:
+            def finished():
+                snapshot.update(json.load(urllib.request.urlopen(f'{url}/jobs/{job_id}')))
+                return snapshot['status'] in ('done', 'failed')
+            wait_for(finished, 120, 'resumed job did not finish')
+            assert snapshot['status'] == 'done', snapshot['error']
+            assert snapshot['processed'] == snapshot['total']
+            rows = urllib.request.urlopen(f'{url}/download/{job_id}?type=all').read().decode().splitlines()[1:]
+            assert len(rows) == len(set(rows)) == snapshot['unique']
+        finally:
+            proc.terminate()
+            proc.wait()
+    assert not checkpoint.exists()
+    assert not os.path.exists(results)
@@ -0,0 +1,32 @@
+"""
+Deduplication order, which resumed jobs rely on to skip finished batches
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEDUP = """
+import json, sys
+sys.path.insert(0, sys.argv[1])
+import benchmark, dedup
+emails = benchmark.generate_emails(2000, domains=300)
+result = dedup.deduplicate(emails, max_keys=100)
+print(json.dumps([result.unique, result.row_to_unique.tolist()]))
+"""
+
+
+def test_partitioned_dedup_is_the_same_in_every_process():
+    runs = []
+    for seed in ('1', '2'):
+        env = dict(os.environ, PYTHONHASHSEED=seed)
+        output = subprocess.run([sys.executable, '-c', DEDUP, ROOT], env=env, check=True,
+                                capture_output=True, text=True).stdout
+        runs.append(json.loads(output))
+    assert runs[0] == runs[1]
+    unique, row_to_unique = runs[0]
+    assert len(unique) == len(set(unique)) > 100
+    assert max(row_to_unique) == len(unique) - 1
@@ -0,0 +1,59 @@
+"""
+Resolver verdicts when the mail exchanger's address lookups fail
+"""
+
+import asyncio
+import os
+import struct
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import benchmark  # noqa: E402
+from dns_resolver import TYPE_A, TYPE_AAAA, AsyncResolver, _read_name, error_verdict, timeout_verdict  # noqa: E402
+
+
+class FlakyExchangerServer(benchmark.StubDNSServer):
+    """Answers MX queries, but drops or SERVFAILs address queries for mx.* hosts"""
+
+    def __init__(self, failure):
+        super().__init__(nxdomain_rate=0.0)
+        self.failure = failure
+
+    def answer(self, data):
+        name, offset = _read_name(data, 12)
+        qtype = struct.unpack('>H', data[offset:offset + 2])[0]
+        if name.startswith('mx.') and qtype in (TYPE_A, TYPE_AAAA):
+            if self.failure == 'drop':
+                return None
+            return data[:2] + struct.pack('>HHHHH', 0x8182, 1, 0, 0, 0) + data[12:offset + 4]
+        return super().answer(data)
+
+
+def check(server, domains):
+    host, port = server.address.rsplit(':', 1)
+    resolver = AsyncResolver(nameservers=[(host, int(port))], timeout=0.2, retries=0)
+
+    async def run():
+        try:
+            return await resolver.check_many(domains)
+        finally:
+            resolver.close()
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize('failure', ['drop', 'servfail'])
+def test_unreachable_exchanger_is_an_error_not_no_mail_server(failure):
+    with FlakyExchangerServer(failure) as server:
+        verdicts = check(server, ['example.org', 'example.net'])
+    expected = timeout_verdict() if failure == 'drop' else error_verdict()
+    assert verdicts == {'example.org': expected, 'example.net': expected}
+
+
+def test_exchanger_with_only_an_a_record_is_deliverable():
+    with benchmark.StubDNSServer(nxdomain_rate=0.0) as server:
+        verdicts = check(server, ['example.org'])
+    assert verdicts['example.org']['deliverable'] and verdicts['example.org']['mx']
@@ -0,0 +1,155 @@
+"""
+A streamed upload survives a hard kill: the checkpoint keeps the upload
+byte for byte and the results saved so far, and a restarted process
+finishes the job under its old ID
+"""
+
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+import uuid
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import benchmark  # noqa: E402
+from dedup import deduplicate  # noqa: E402
+
+SERVE = """
+import sys
+sys.path.insert(0, sys.argv[1])
+if __name__ == '__main__':
+    from werkzeug.serving import make_server
+    import main
+    main.startup()
+    make_server('127.0.0.1', int(sys.argv[2]), main.app, threaded=True).serve_forever()
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workdir, resolver):
+    port = free_port()
+    env = dict(os.environ, DNS_RESOLVER=resolver, VERDICT_DB='', ADDRESS_DB='', SHARED_STATE_DB='',
+               JOB_CHECKPOINT_SECONDS='0.2', LOG_LEVEL='WARNING')
+    proc = subprocess.Popen([sys.executable, '-c', SERVE, ROOT, str(port)], cwd=workdir, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(url + '/metrics', timeout=1)
+            return proc, url
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    pytest.fail('server did not start')
+
+
+def upload(url, name, data):
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{name}"\r\n'
+            f'Content-Type: text/csv\r\n\r\n').encode() + data + f'\r\n--{boundary}--\r\n'.encode()
+    request = urllib.request.Request(url + '/validate', data=body,
+                                      headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+    return json.load(urllib.request.urlopen(request))
+
+
+def test_killed_streaming_job_resumes_from_identical_input(tmp_path):
+    source = tmp_path / 'in.csv'
+    emails = benchmark.generate_emails(3000, domains=1500, zipf=0.5)
+    benchmark.write_csv(str(source), emails)
+    data = source.read_bytes()
+
+    with benchmark.StubDNSServer(latency=0.2) as stub:
+        proc, url = start_server(tmp_path, stub.address)
+        try:
+            job_id = upload(url, 'in.csv', data)['job_id']
+            checkpoint = tmp_path / 'uploads' / 'jobs' / job_id
+            deadline = time.monotonic() + 30
+            while not (checkpoint / 'manifest.json').exists():
+                assert time.monotonic() < deadline, 'checkpoint never committed'
+                time.sleep(0.05)
+            snapshot = json.load(urllib.request.urlopen(f'{url}/jobs/{job_id}'))
+            assert snapshot['status'] != 'done'
+        finally:
+            proc.send_signal(signal.SIGKILL)
+            proc.wait()
+
+        assert (checkpoint / 'input.csv').read_bytes() == data
+
+        proc, url = start_server(tmp_path, stub.address)
+        try:
+            deadline = time.monotonic() + 120
+            while True:
+                snapshot = json.load(urllib.request.urlopen(f'{url}/jobs/{job_id}'))
+                if snapshot['status'] in ('done', 'failed'):
+                    break
+                assert time.monotonic() < deadline, 'resumed job did not finish'
+                time.sleep(0.1)
+            assert snapshot['status'] == 'done', snapshot['error']
+            assert snapshot['total'] == sum(1 for email in emails if '@' in email and '.' in email)
+            rows = urllib.request.urlopen(f'{url}/download/{job_id}?type=all').read().decode().splitlines()
+            assert len(rows) - 1 == snapshot['unique']
+        finally:
+            proc.terminate()
+            proc.wait()
+    assert not checkpoint.exists()
+
+
+def test_killed_streaming_job_keeps_saved_results_and_final_occurrences(tmp_path):
+    # Several parse chunks, with later chunks repeating addresses already written out
+    emails = benchmark.generate_emails(30000, duplicate_rate=0.3, domains=5000, zipf=0.5)
+    source = tmp_path / 'in.csv'
+    benchmark.write_csv(str(source), emails)
+
+    with benchmark.StubDNSServer(latency=0.2) as stub:
+        proc, url = start_server(tmp_path, stub.address)
+        try:
+            job_id = upload(url, 'in.csv', source.read_bytes())['job_id']
+            manifest = tmp_path / 'uploads' / 'jobs' / job_id / 'manifest.json'
+            deadline = time.monotonic() + 60
+            while True:
+                try:
+                    if json.loads(manifest.read_text())['batches'] >= 3:
+                        break
+                except (OSError, ValueError):
+                    pass
+                assert time.monotonic() < deadline, 'no result batch was checkpointed'
+                time.sleep(0.05)
+            snapshot = json.load(urllib.request.urlopen(f'{url}/jobs/{job_id}'))
+            assert snapshot['status'] != 'done'
+        finally:
+            proc.send_signal(signal.SIGKILL)
+            proc.wait()
+
+        proc, url = start_server(tmp_path, stub.address)
+        try:
+            deadline = time.monotonic() + 120
+            while True:
+                snapshot = json.load(urllib.request.urlopen(f'{url}/jobs/{job_id}'))
+                if snapshot['status'] in ('done', 'failed'):
+                    break
+                assert time.monotonic() < deadline, 'resumed job did not finish'
+                time.sleep(0.1)
+            assert snapshot['status'] == 'done', snapshot['error']
+            assert snapshot['processed'] == snapshot['total']
+            rows = urllib.request.urlopen(f'{url}/download/{job_id}?type=all').read().decode().splitlines()[1:]
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    expected = deduplicate([email for email in emails if '@' in email and '.' in email])
+    occurrences = {row.split(',')[0]: int(row.split(',')[5]) for row in rows}
+    assert len(occurrences) == len(rows)
+    assert occurrences == dict(zip(expected.unique, expected.counts.tolist()))
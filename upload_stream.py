@@ -0,0 +1,170 @@
+"""
+Streaming multipart uploads
+Decodes a multipart/form-data request body as it arrives: form fields are
+collected and the file part is exposed as a readable binary stream. A
+Spool lands that stream on disk while a job reads it back as it grows, so
+parsing starts while the rest of the upload is still on the wire
+"""
+
+import io
+import os
+import threading
+
+from werkzeug.sansio.multipart import NEED_DATA, Data, Epilogue, Field, File, MultipartDecoder
+
+READ_SIZE = 64 * 1024
+MAX_FIELD_SIZE = 64 * 1024
+
+
+class MultipartUpload(io.RawIOBase):
+    """The file part of a multipart body, read straight off the request stream"""
+
+    def __init__(self, stream, boundary, field_name='file', read_size=READ_SIZE):
+        super().__init__()
+        self.stream = stream
+        self.field_name = field_name
+        self.read_size = read_size
+        self.fields = {}
+        self.filename = None
+        self.received = 0
+        self._decoder = MultipartDecoder(boundary.encode('latin-1'))
+        self._part = None  # 'file', a field name, or None for a part that is skipped
+        self._field = bytearray()
+        self._data = bytearray()  # file bytes not read yet
+        self._file_done = False
+        self._body_done = False
+
+    def _pump(self):
+        """Feed one read of the request body to the decoder; False once the body is exhausted"""
+        if self._body_done:
+            return False
+        chunk = self.stream.read(self.read_size)
+        self.received += len(chunk)
+        self._decoder.receive_data(chunk or None)
+        self._body_done = not chunk
+
+        event = self._decoder.next_event()
+        while event is not NEED_DATA and not isinstance(event, Epilogue):
+            if isinstance(event, File) and event.name == self.field_name and self.filename is None:
+                self._part = 'file'
+                self.filename = event.filename or ''
+            elif isinstance(event, Field):
+                self._part = event.name
+                self._field.clear()
+            elif isinstance(event, File):
+                self._part = None
+            elif isinstance(event, Data):
+                self._receive(event)
+            event = self._decoder.next_event()
+        if isinstance(event, Epilogue):
+            self._body_done = True
+        return not self._body_done
+
+    def _receive(self, event):
+        if self._part == 'file':
+            self._data += event.data
+            self._file_done = not event.more_data
+        elif self._part is not None:
+            self._field += event.data
+            if len(self._field) > MAX_FIELD_SIZE:
+                raise ValueError(f"Form field too large: {self._part}")
+            if not event.more_data:
+                self.fields[self._part] = self._field.decode('utf-8', 'replace')
+
+    def start(self):
+        """Read up to the file part; returns its filename, or None if the body has none"""
+        while self.filename is None and self._pump():
+            pass
+        return self.filename
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while len(self._data) < len(buffer) and not self._file_done:
+            if not self._pump() and not self._file_done:
+                raise ValueError("Upload ended before the file was complete")
+        size = min(len(buffer), len(self._data))
+        buffer[:size] = self._data[:size]
+        del self._data[:size]
+        return size
+
+    def finish(self):
+        """Consume the rest of the body, including any fields after the file; returns the fields"""
+        while self._pump():
+            pass
+        return self.fields
+
+
+class Spool:
+    """A file written by one thread (the request) while others read it as it grows"""
+
+    def __init__(self, path, complete=False):
+        """A new, empty spool; with complete, one over a finished file already at path"""
+        self.path = path
+        self.size = os.path.getsize(path) if complete else 0
+        self.done = complete
+        self.error = None
+        self._file = None if complete else open(path, 'wb')
+        self._changed = threading.Condition()
+
+    def write(self, data):
+        self._file.write(data)
+        self._file.flush()
+        with self._changed:
+            self.size += len(data)
+            self._changed.notify_all()
+
+    def sync(self):
+        """Make everything written so far durable"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self, error=None):
+        """No more data; readers see EOF, or error if the upload failed"""
+        self._file.close()
+        with self._changed:
+            self.done = True
+            self.error = error
+            self._changed.notify_all()
+
+    def reader(self):
+        return SpoolReader(self)
+
+
+class SpoolReader(io.RawIOBase):
+    """Reads a Spool from the start, blocking for data the writer has not written yet"""
+
+    def __init__(self, spool):
+        super().__init__()
+        self.spool = spool
+        self._file = open(spool.path, 'rb')
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        # Fill the whole buffer unless the spool ends first, so peek() samples are complete
+        view = memoryview(buffer)
+        filled = 0
+        spool = self.spool
+        while filled < len(view):
+            with spool._changed:
+                while spool.size <= self._position and not spool.done:
+                    spool._changed.wait()
+                if spool.error is not None:
+                    raise ValueError(f"Upload failed: {spool.error}")
+                available = spool.size - self._position
+            if available <= 0:
+                break
+            count = self._file.readinto(view[filled:filled + available])
+            if not count:
+                break
+            self._position += count
+            filled += count
+        return filled
+
+    def close(self):
+        self._file.close()
+        super().close()
@@ -0,0 +1,105 @@
+"""
+Persistent domain verdict store
+SQLite in WAL mode so verdicts survive restarts and deploys and can be
+read by several processes while one writes
+"""
+
+import json
+import time
+
+from sqlite_store import SQLiteStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS domain_verdicts (
+    domain      TEXT PRIMARY KEY,
+    verdict     TEXT NOT NULL,
+    resolved_at REAL NOT NULL,
+    ttl         INTEGER NOT NULL,
+    hits        INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_domain_verdicts_hits ON domain_verdicts (hits DESC);
+"""
+
+
+class VerdictStore(SQLiteStore):
+    """Domain -> verdict rows with resolution timestamp and TTL"""
+
+    schema = SCHEMA
+
+    @staticmethod
+    def _row_to_verdict(verdict_json, resolved_at, ttl, now):
+        verdict = json.loads(verdict_json)
+        verdict['ttl'] = int(resolved_at + ttl - now)
+        return verdict
+
+    def get(self, domain):
+        """Unexpired verdict with its remaining TTL, or None"""
+        return self.get_many([domain]).get(domain)
+
+    def get_many(self, domains, batch_size=500):
+        """Unexpired verdicts for many domains; bumps their hit counters"""
+        now = time.time()
+        found = {}
+        domains = list(domains)
+        conn = self._conn()
+        for start in range(0, len(domains), batch_size):
+            batch = domains[start:start + batch_size]
+            placeholders = ','.join('?' * len(batch))
+            rows = conn.execute(
+                f"SELECT domain, verdict, resolved_at, ttl FROM domain_verdicts "
+                f"WHERE domain IN ({placeholders}) AND resolved_at + ttl > ?",
+                batch + [now],
+            ).fetchall()
+            for domain, verdict_json, resolved_at, ttl in rows:
+                found[domain] = self._row_to_verdict(verdict_json, resolved_at, ttl, now)
+
+        if found:
+            conn.executemany("UPDATE domain_verdicts SET hits = hits + 1 WHERE domain = ?",
+                             [(domain,) for domain in found])
+        return found
+
+    def put(self, domain, verdict, ttl):
+        self.put_many([(domain, verdict, ttl)])
+
+    def put_many(self, items):
+        """Store (domain, verdict, ttl) tuples in a single transaction"""
+        now = time.time()
+        rows = []
+        for domain, verdict, ttl in items:
+            if ttl <= 0:
+                continue
+            stored = {key: value for key, value in verdict.items() if key != 'ttl'}
+            rows.append((domain, json.dumps(stored, separators=(',', ':')), now, int(ttl)))
+        if not rows:
+            return
+
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN')
+            conn.executemany(
+                "INSERT INTO domain_verdicts (domain, verdict, resolved_at, ttl) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(domain) DO UPDATE SET verdict = excluded.verdict, "
+                "resolved_at = excluded.resolved_at, ttl = excluded.ttl",
+                rows,
+            )
+
+    def hottest(self, limit):
+        """Most frequently read unexpired verdicts, for warm-start preloading"""
+        now = time.time()
+        rows = self._conn().execute(
+            "SELECT domain, verdict, resolved_at, ttl FROM domain_verdicts "
+            "WHERE resolved_at + ttl > ? ORDER BY hits DESC LIMIT ?",
+            (now, limit),
+        ).fetchall()
+        return [(domain, self._row_to_verdict(v, resolved_at, ttl, now)) for domain, v, resolved_at, ttl in rows]
+
+    def compact(self):
+        """Drop expired entries and truncate the WAL; returns rows removed"""
+        conn = self._conn()
+        removed = conn.execute("DELETE FROM domain_verdicts WHERE resolved_at + ttl <= ?",
+                               (time.time(),)).rowcount
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        return removed
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM domain_verdicts").fetchone()[0]